@@ -4,15 +4,68 @@ Construct the Abstract Syntax Tree.
 '''
 
 import abc
+import array
 import enum
+import operator
+import re
 
 import lexer
+import source
+import tok
 
 
 class AstNode(metaclass=abc.ABCMeta):
     '''Ast Node in cmake syntax.
     '''
 
+    __slots__ = ()
+
+
+class CommandInvocation(AstNode):
+    '''A command invocation, e.g., add_library(foo foo.cc).
+
+    Parentheses nested in the arguments, as in if((a OR b) AND c), are kept as
+    tok.Bra and tok.Ket tokens among the arguments.  Comments are dropped.
+    '''
+
+    def __init__(self, name, arguments, span=None):
+        '''Create a CommandInvocation.
+
+        :param name: The name of the command, as written in the source.
+        :param arguments: The list of argument tokens.
+        :param span: The (start, end) offsets of the invocation in the source,
+            from the first character of the name to the closing parenthesis,
+            or None if the tokens carry no location.
+        '''
+        self.name = name
+        self.arguments = arguments
+        self.span = span
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ \
+                and self.name == other.name \
+                and self.arguments == other.arguments
+
+    def __repr__(self):
+        return '<%s %s %r>' % (
+            self.__class__.__name__, self.name, self.arguments
+        )
+
+
+class File(AstNode):
+    '''A whole cmake source, i.e., the list of its command invocations.
+    '''
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ \
+                and self.commands == other.commands
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.commands)
+
 
 class _State(enum.Enum):
     '''Internal state of the parser.
@@ -23,15 +76,408 @@ class _State(enum.Enum):
     End = -1
 
 
+_IDENTIFIER_REGEX = re.compile('[A-Za-z_][A-Za-z0-9_]*$')
+
+_COMMENT = int(tok.Kind.Comment)
+_UNQUOTED_ARGUMENT = int(tok.Kind.UnquotedArgument)
+_BRA = int(tok.Kind.Bra)
+_KET = int(tok.Kind.Ket)
+
+# Gets the token of a (kind, token) pair.
+_second = operator.itemgetter(1)
+
+
+def _pair_text(pair):
+    '''Get the text of the token of a (kind, token) pair.
+    '''
+    return pair[1].orig_text
+
+
+def _error(token, message):
+    '''Report an unexpected token.
+    '''
+    if token.offset is None:
+        raise ValueError(token.orig_text, message)
+    raise ValueError(
+        token.orig_text, message,
+        'at line %d column %d' % (token.line, token.column)
+    )
+
+
+def _not_closed(name):
+    '''Report a command that is not closed at the end of the input.
+    '''
+    raise ValueError(name, 'is not closed at the end of the input')
+
+
+def walk_commands(items, text_of, token_of, *, on_comment=None):
+    '''Generate the command invocations of a sequence of tokens or spans.
+
+    This is the grammar of command invocations shared by AstParser,
+    Arena.from_buffer() and events.parse_events(): a command name, which must
+    be an identifier, then a parenthesized list of arguments in which
+    parentheses nest.  Comments may appear anywhere.  A ValueError reports an
+    unexpected item or a command that is not closed.
+
+    :param items: An iterable of tuples whose first item is a tok.Kind, e.g.,
+        (kind, start, end) spans or (kind, token) pairs.
+    :param text_of: A function getting the text of an item, which is used to
+        read command names.
+    :param token_of: A function getting the token of an item, which is used to
+        report errors.
+    :param on_comment: If not None, called with every comment item, including
+        the ones among arguments.
+
+    :return: A generator of (name, first, arguments, last) tuples: the name of
+        a command, its item, the list of its argument items, comments excluded
+        and nested parentheses included, and the item of its closing
+        parenthesis.
+    '''
+    comment, bra, ket = _COMMENT, _BRA, _KET
+    items = iter(items)
+    for item in items:
+        kind = item[0]
+        if kind == comment:
+            if on_comment is not None:
+                on_comment(item)
+            continue
+        if kind != _UNQUOTED_ARGUMENT:
+            _error(token_of(item), 'expected a command name')
+        name = text_of(item)
+        if not _IDENTIFIER_REGEX.match(name):
+            _error(token_of(item), 'expected a command name')
+        first = item
+
+        for item in items:
+            kind = item[0]
+            if kind != comment:
+                break
+            if on_comment is not None:
+                on_comment(item)
+        else:
+            _not_closed(name)
+        if kind != bra:
+            _error(token_of(item), 'expected (')
+
+        arguments = []
+        append = arguments.append
+        depth = 0
+        for item in items:
+            kind = item[0]
+            if kind == ket:
+                if depth == 0:
+                    break
+                depth -= 1
+            elif kind == bra:
+                depth += 1
+            elif kind == comment:
+                if on_comment is not None:
+                    on_comment(item)
+                continue
+            append(item)
+        else:
+            _not_closed(name)
+        yield name, first, arguments, item
+
+
+def walk_spans(src, *, spans=None, on_comment=None):
+    '''Run walk_commands() over the spans of a source.Source.
+
+    The items are (kind, start, end) spans, and no token is created but to
+    report an error.
+
+    :param spans: The spans of the tokens of src, e.g., from
+        token_table.TokenTable.spans().  Defaults to the spans of
+        lexer.iter_spans() over the buffer of src.
+    '''
+    text = src.text
+    classes = tok.CLASSES
+
+    def span_text(span):
+        return text(span[1], span[2])
+
+    def make_token(span):
+        kind, start, end = span
+        return classes[kind](None, src, start, end)
+
+    if spans is None:
+        spans = lexer.iter_spans(src.buffer)
+    return walk_commands(spans, span_text, make_token, on_comment=on_comment)
+
+
 class AstParser(object):
     '''Parse lexical tokens into an AST.
+
+    Tokens are pulled from the lexer one at a time and command invocations are
+    generated as soon as their closing parenthesis is read, so iterating over
+    the parser takes memory proportional to the largest command rather than to
+    the whole source.
     '''
 
+    @classmethod
+    def from_string(cls, text, **kwargs):
+        '''Create an AstParser from a string.
+
+        Keyword arguments are passed to lexer.Tokenizer.from_string().
+        '''
+        return cls(lexer.Tokenizer.from_string(text, **kwargs))
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        '''Create an AstParser from a CMakeLists.txt file.
+
+        Keyword arguments are passed to lexer.Tokenizer.from_file().
+        '''
+        return cls(lexer.Tokenizer.from_file(filename, **kwargs))
+
     def __init__(self, lexer):
+        # pylint: disable=redefined-outer-name
         self._lexer = lexer
+        self._state = _State.Start
 
-    def parse():
+    def __iter__(self):
+        '''Generate the CommandInvocation nodes of the source in order.
+        '''
+        pairs = ((token.KIND, token) for token in self._lexer)
+        for name, first, arguments, last in walk_commands(
+            pairs, _pair_text, _second
+        ):
+            start = first[1].offset
+            span = None if start is None else (start, last[1].span[1])
+            yield CommandInvocation(
+                name, [token for _, token in arguments], span
+            )
+        self._state = _State.End
+
+    def parse(self):
         '''Parse the tokens into AST.
 
-        :return: The root AstNode.
+        :return: The root AstNode, a File holding all command invocations.
+        '''
+        return File(list(self))
+
+
+@enum.unique
+class NodeKind(enum.IntEnum):
+    '''Kind of the inner nodes of an Arena.
+
+    Leaves hold a single token and use the tok.Kind of the token as their kind,
+    so the inner node kinds are chosen outside of tok.Kind.
+    '''
+
+    File = 32
+    CommandInvocation = 33
+
+
+class Arena(object):
+    '''An AST stored in flat parallel arrays, one item per node.
+
+    Nodes are numbered in preorder, the File root being node 0.  The children
+    of a CommandInvocation are the token of its name followed by its argument
+    tokens, laid out as in CommandInvocation.  For each node, the arrays hold:
+        kinds           NodeKind, or tok.Kind for leaves
+        parents         index of the parent node, -1 for the root
+        first_children  index of the first child, -1 for leaves
+        next_siblings   index of the next sibling, -1 for the last child
+        starts, ends    the span of the node in the source
+
+    No Python object is kept per node.  root and node() return ArenaNode views
+    and tokens created on access.
+    '''
+
+    def __init__(self, source):
+        '''Create an empty Arena.
+
+        :param source: The source.Source the spans refer to.
+        '''
+        # pylint: disable=redefined-outer-name
+        self.source = source
+        self.kinds = array.array('B')
+        self.parents = array.array('i')
+        self.first_children = array.array('i')
+        self.next_siblings = array.array('i')
+        self.starts = array.array('I')
+        self.ends = array.array('I')
+
+    @classmethod
+    def from_buffer(cls, buffer, *, encoding='utf-8'):
+        '''Parse a whole buffer into an Arena.
+
+        Walks the spans of the buffer with walk_spans() without creating any
+        token.  Comments are dropped.
+
+        :param buffer: A str, or a bytes-like object such as bytes, memoryview
+            or mmap.mmap, in which case the offsets are byte offsets.
+        :param encoding: Encoding used to decode the text of a token from a
+            bytes-like buffer.
+        '''
+        # pylint: disable=too-many-locals
+        src = source.Source(buffer, encoding=encoding)
+        arena = cls(src)
+        kinds = arena.kinds
+        append_kind = kinds.append
+        append_parent = arena.parents.append
+        first_children = arena.first_children
+        append_first_child = first_children.append
+        next_siblings = arena.next_siblings
+        append_next_sibling = next_siblings.append
+        append_start = arena.starts.append
+        append_end = arena.ends.append
+
+        def append(kind, parent, start, end):
+            append_kind(kind)
+            append_parent(parent)
+            append_first_child(-1)
+            append_next_sibling(-1)
+            append_start(start)
+            append_end(end)
+
+        append(NodeKind.File, -1, 0, len(buffer))
+        previous_command = -1
+        for _, first, arguments, last in walk_spans(src):
+            _, start, end = first
+            command = len(kinds)
+            if previous_command == -1:
+                first_children[0] = command
+            else:
+                next_siblings[previous_command] = command
+            previous_command = command
+            append(NodeKind.CommandInvocation, 0, start, last[2])
+            first_children[command] = command + 1
+            append(_UNQUOTED_ARGUMENT, command, start, end)
+            previous = command + 1
+            for kind, start, end in arguments:
+                next_siblings[previous] = previous = len(kinds)
+                append(kind, command, start, end)
+        return arena
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def root(self):
+        '''The ArenaFile view of the root node.
+        '''
+        return ArenaFile(self, 0)
+
+    def node(self, index):
+        '''Get an ArenaNode view of an inner node, or the token of a leaf.
+        '''
+        kind = self.kinds[index]
+        if kind == NodeKind.CommandInvocation:
+            return ArenaCommandInvocation(self, index)
+        if kind == NodeKind.File:
+            return ArenaFile(self, index)
+        return tok.CLASSES[kind](
+            None, self.source, self.starts[index], self.ends[index]
+        )
+
+    def children(self, index):
+        '''Iterate over the indexes of the children of a node.
+        '''
+        next_siblings = self.next_siblings
+        child = self.first_children[index]
+        while child != -1:
+            yield child
+            child = next_siblings[child]
+
+
+class ArenaNode(AstNode):
+    '''A view of an inner node of an Arena.
+
+    Holds nothing but the arena and the index of the node, so views can be
+    created and dropped freely.
+    '''
+
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def kind(self):
+        '''The NodeKind of the node.
+        '''
+        return NodeKind(self.arena.kinds[self.index])
+
+    @property
+    def span(self):
+        '''The (start, end) offsets of the node in the source.
+        '''
+        return self.arena.starts[self.index], self.arena.ends[self.index]
+
+    @property
+    def parent(self):
+        '''The view of the parent node, or None for the root.
+        '''
+        parent = self.arena.parents[self.index]
+        return None if parent == -1 else self.arena.node(parent)
+
+    @property
+    def children(self):
+        '''The list of child views and leaf tokens.
+        '''
+        node = self.arena.node
+        return [node(child) for child in self.arena.children(self.index)]
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ \
+                and self.arena is other.arena and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return '<%s %d>' % (self.__class__.__name__, self.index)
+
+
+class ArenaFile(ArenaNode):
+    '''A view of the File root of an Arena.
+    '''
+
+    __slots__ = ()
+
+    @property
+    def commands(self):
+        '''Generate the ArenaCommandInvocation views of the commands.
+        '''
+        arena = self.arena
+        for child in arena.children(self.index):
+            yield ArenaCommandInvocation(arena, child)
+
+
+class ArenaCommandInvocation(ArenaNode):
+    '''A view of a CommandInvocation node of an Arena.
+    '''
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        '''The name of the command, as written in the source.
+        '''
+        arena = self.arena
+        name = self.index + 1
+        return arena.source.text(arena.starts[name], arena.ends[name])
+
+    @property
+    def arguments(self):
+        '''The list of argument tokens, created on access.
         '''
+        # The leaves of a command follow it in preorder, up to the next
+        # command.
+        arena = self.arena
+        start = self.index + 2
+        stop = arena.next_siblings[self.index]
+        if stop == -1:
+            stop = len(arena.kinds)
+        classes = tok.CLASSES
+        src = arena.source
+        return [
+            classes[kind](None, src, token_start, token_end)
+            for kind, token_start, token_end in zip(
+                arena.kinds[start:stop], arena.starts[start:stop],
+                arena.ends[start:stop]
+            )
+        ]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+'''Compare the arena AST against an object-per-node AST.
+
+For test_data/3.txt and for a large source generated by the corpus module,
+reports the time to build each AST, the memory it retains, not counting the
+source text, and the time to visit the name and the text of every argument of
+every command.
+'''
+
+import argparse
+import gc
+import pathlib
+import time
+import tracemalloc
+
+import ast
+import corpus
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+def build_objects(text):
+    '''Build the object-per-node AST of text.
+    '''
+    return ast.AstParser.from_string(text, engine='regex').parse()
+
+
+BUILDERS = {
+    'objects': build_objects,
+    'arena': ast.Arena.from_buffer,
+}
+
+
+def build_time(text, builder):
+    '''Get the time taken to build the AST of text.
+    '''
+    start = time.perf_counter()
+    builder(text)
+    return time.perf_counter() - start
+
+
+def retained_memory(text, builder):
+    '''Get the bytes retained by the AST of text.
+
+    :return: A (root, bytes) tuple.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tree = builder(text)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return tree, after - before
+
+
+def traverse(tree):
+    '''Visit the name and the text of every argument of every command.
+
+    :return: The number of nodes visited.
+    '''
+    root = tree.root if isinstance(tree, ast.Arena) else tree
+    count = 0
+    for command in root.commands:
+        command.name  # pylint: disable=pointless-statement
+        arguments = command.arguments
+        for argument in arguments:
+            argument.orig_text  # pylint: disable=pointless-statement
+        count += len(arguments) + 1
+    return count
+
+
+def report(label, text):
+    '''Measure and print the numbers of each builder for text.
+    '''
+    for name in sorted(BUILDERS):
+        builder = BUILDERS[name]
+        elapsed = build_time(text, builder)
+        tree, size = retained_memory(text, builder)
+        start = time.perf_counter()
+        count = traverse(tree)
+        traversal = time.perf_counter() - start
+        print(
+            '%-8s %-8s build %7.3fs  memory %8.1f MB %6.1f bytes/node  '
+            'traverse %7.3fs' %
+            (label, name, elapsed, size / 1e6, size / count, traversal)
+        )
+        del tree
+        gc.collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=100,
+        help='size of the synthetic corpus, in MB (default: 100)'
+    )
+    args = parser.parse_args()
+    with open(str(DATA_DIR / '3.txt'), 'r') as f:
+        report('3.txt', f.read())
+    report('%dMB' % args.size, corpus.generate(args.size * 1000000)[0])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,212 @@
 # pylint: disable=missing-docstring
 
+import glob
+import pathlib
 import unittest
 
+import ast
+import lexer
+import source
+import tok
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
 
 class TestAstNode(unittest.TestCase):
 
     def test_init(self):
-        pass
+        node = ast.CommandInvocation('foo', [tok.UnquotedArgument('bar')])
+        self.assertEqual(node.name, 'foo')
+        self.assertEqual(node.arguments, [tok.UnquotedArgument('bar')])
+        self.assertIsNone(node.span)
+        self.assertIsInstance(node, ast.AstNode)
+
+
+class TestAstParser(unittest.TestCase):
+
+    def test_commands(self):
+        text = '''# comment
+add_library(foo # inline comment
+    "foo.cc" [[foo.h]])
+
+message(STATUS)
+'''
+        commands = list(ast.AstParser.from_string(text))
+        self.assertEqual(
+            commands, [
+                ast.CommandInvocation(
+                    'add_library', [
+                        tok.UnquotedArgument('foo'),
+                        tok.QuotedArgument('"foo.cc"'),
+                        tok.BracketArgument('[[foo.h]]'),
+                    ]
+                ),
+                ast.CommandInvocation(
+                    'message', [tok.UnquotedArgument('STATUS')]
+                ),
+            ]
+        )
+        self.assertEqual(commands[0].span, (10, 66))
+        self.assertEqual(text[slice(*commands[1].span)], 'message(STATUS)')
+
+    def test_nested_parentheses(self):
+        commands = list(ast.AstParser.from_string('if((a OR b) AND c)'))
+        self.assertEqual([token.orig_text for token in commands[0].arguments],
+                         ['(', 'a', 'OR', 'b', ')', 'AND', 'c'])
+
+    def test_no_locations(self):
+        commands = list(ast.AstParser.from_string('f()', locations=False))
+        self.assertEqual(commands, [ast.CommandInvocation('f', [])])
+        self.assertIsNone(commands[0].span)
+
+    def test_streaming(self):
+        parser = ast.AstParser(lexer.Tokenizer.from_string('a() b('))
+        commands = iter(parser)
+        self.assertEqual(next(commands), ast.CommandInvocation('a', []))
+        with self.assertRaises(ValueError):
+            next(commands)
+
+    def test_errors(self):
+        for text in ('"a"()', 'a b', 'a)', '1a()', '(', 'a(b'):
+            with self.assertRaises(ValueError, msg=text):
+                ast.AstParser.from_string(text).parse()
+
+    def test_parse(self):
+        root = ast.AstParser.from_string('a()\nb(c)').parse()
+        self.assertIsInstance(root, ast.File)
+        self.assertEqual([command.name for command in root.commands],
+                         ['a', 'b'])
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            root = ast.AstParser.from_file(src_path).parse()
+            self.assertTrue(root.commands, msg=src_path)
+            tokens = [
+                token for token in lexer.Tokenizer.from_file(src_path)
+                if not isinstance(token, tok.Comment)
+            ]
+            self.assertEqual(
+                sum(len(command.arguments) + 3 for command in root.commands),
+                len(tokens),
+                msg=src_path
+            )
+
+
+class TestWalkCommands(unittest.TestCase):
+
+    def test_walk_spans(self):
+        src = source.Source('# a\nf(x # b\n (y))\ng()')
+        comments = []
+        commands = [
+            (name, first[1:], [span[1:] for span in arguments], last[1:])
+            for name, first, arguments, last in
+            ast.walk_spans(src, on_comment=comments.append)
+        ]
+        self.assertEqual(
+            commands, [
+                ('f', (4, 5), [(6, 7), (13, 14), (14, 15), (15, 16)], (16, 17)),
+                ('g', (18, 19), [], (20, 21)),
+            ]
+        )
+        self.assertEqual([span[1:] for span in comments], [(0, 3), (8, 11)])
+
+    def test_same_grammar(self):
+        text = 'a(b # c\n (d))\n'
+        tokens = list(lexer.Tokenizer.from_string(text))
+        pairs = [(token.KIND, token) for token in tokens]
+        names = [
+            name for name, _, _, _ in ast.walk_commands(
+                pairs, lambda pair: pair[1].orig_text, lambda pair: pair[1]
+            )
+        ]
+        self.assertEqual(names, ['a'])
+        self.assertEqual([
+            name for name, _, _, _ in ast.walk_spans(source.Source(text))
+        ], names)
+
+
+class TestArena(unittest.TestCase):
+
+    TEXT = '''# comment
+add_library(foo # inline comment
+    "foo.cc" [[foo.h]])
+if((a OR b) AND c)
+endif()
+'''
+
+    def test_arrays(self):
+        arena = ast.Arena.from_buffer(self.TEXT)
+        self.assertEqual(len(arena), 17)
+        self.assertEqual(
+            arena.kinds[:3].tolist(), [
+                ast.NodeKind.File,
+                ast.NodeKind.CommandInvocation,
+                tok.Kind.UnquotedArgument,
+            ]
+        )
+        self.assertEqual(list(arena.children(0)), [1, 6, 15])
+        self.assertEqual(list(arena.children(15)), [16])
+        self.assertEqual(arena.parents[:3].tolist(), [-1, 0, 1])
+        self.assertEqual(arena.first_children[2], -1)
+
+    def test_views(self):
+        arena = ast.Arena.from_buffer(self.TEXT)
+        root = arena.root
+        self.assertEqual(root.kind, ast.NodeKind.File)
+        self.assertIsNone(root.parent)
+        self.assertEqual(root.span, (0, len(self.TEXT)))
+        commands = list(root.commands)
+        self.assertEqual([command.name for command in commands],
+                         ['add_library', 'if', 'endif'])
+        self.assertEqual(
+            commands[0].arguments, [
+                tok.UnquotedArgument('foo'),
+                tok.QuotedArgument('"foo.cc"'),
+                tok.BracketArgument('[[foo.h]]'),
+            ]
+        )
+        self.assertEqual(commands[0].span, (10, 66))
+        self.assertEqual(commands[0].parent, root)
+        self.assertEqual(commands[2].arguments, [])
+        self.assertEqual(arena.node(commands[1].index), commands[1])
+        self.assertEqual(arena.node(2), tok.UnquotedArgument('add_library'))
+
+    def test_bytes(self):
+        arena = ast.Arena.from_buffer(self.TEXT.encode())
+        self.assertEqual([command.name for command in arena.root.commands],
+                         ['add_library', 'if', 'endif'])
+
+    def test_empty(self):
+        arena = ast.Arena.from_buffer('# nothing\n')
+        self.assertEqual(len(arena), 1)
+        self.assertEqual(list(arena.root.commands), [])
+
+    def test_errors(self):
+        for text in (
+            '"a"()', 'a b', 'a)', '1abc()', 'a-b()', '(', 'a(b', 'a #c\n',
+            'a\n  b'
+        ):
+            with self.assertRaises(ValueError, msg=text) as expected:
+                ast.AstParser.from_string(text).parse()
+            for buffer in (text, text.encode()):
+                with self.assertRaises(ValueError, msg=text) as context:
+                    ast.Arena.from_buffer(buffer)
+                self.assertEqual(
+                    context.exception.args, expected.exception.args
+                )
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'r') as f:
+                text = f.read()
+            expected = list(ast.AstParser.from_string(text))
+            commands = list(ast.Arena.from_buffer(text).root.commands)
+            self.assertEqual([(command.name, command.arguments, command.span)
+                              for command in commands],
+                             [(command.name, command.arguments, command.span)
+                              for command in expected],
+                             msg=src_path)
 
 
 if __name__ == '__main__':
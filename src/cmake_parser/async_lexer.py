@@ -0,0 +1,119 @@
+'''Tokenize cmake sources arriving asynchronously.
+'''
+
+import asyncio
+
+import lexer
+import source
+
+CHUNK_SIZE = 64 * 1024
+
+# The number of tokens generated between two chances given to the event loop
+# to run other tasks.
+YIELD_EVERY = 1024
+
+
+class AsyncTokenizer(object):
+    '''Tokenize bytes read from an asyncio.StreamReader or an async iterator.
+
+    Use it with async for.  The input is scanned chunk by chunk as it arrives
+    with the regex engine of lexer.  Only the bytes of a token that is not
+    complete yet are kept between chunks, so a token may start in one chunk
+    and end in any later one.
+
+    Tokens are the same as the ones of lexer.Tokenizer.from_buffer() over the
+    whole input: their offsets are byte offsets from the start of the input and
+    their columns count bytes.  They own their text, decoded with the given
+    encoding.
+
+    Each chunk is scanned one token at a time as the tokens are consumed, so a
+    large chunk is not scanned whole before its first token is generated.  The
+    event loop gets a chance to run other tasks at least every YIELD_EVERY
+    tokens, even when the consumer does not await anything else.
+    '''
+
+    def __init__(self, stream, *, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+        '''Create an AsyncTokenizer.
+
+        :param stream: An asyncio.StreamReader, or any object with an async
+            read(n) method, or an async iterable of bytes-like chunks.
+        :param chunk_size: The size of the reads from a StreamReader.
+        :param encoding: Encoding used to decode the text of the tokens.
+        '''
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._encoding = encoding
+        self.line_index = source.LineIndex()
+
+    async def _chunks(self):
+        '''Generate the chunks of the input.
+        '''
+        read = getattr(self._stream, 'read', None)
+        if read is None:
+            async for chunk in self._stream:
+                yield chunk
+            return
+        while True:
+            chunk = await read(self._chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _make(self, buffer, base, spans):
+        '''Generate the tokens of spans of the buffer starting at offset base.
+
+        Generates (token, end of the token in the buffer) tuples.
+        '''
+        encoding = self._encoding
+        line_index = self.line_index
+        for clazz, start, end in spans:
+            yield clazz(
+                bytes(buffer[start:end]).decode(encoding), line_index,
+                base + start, base + end
+            ), end
+
+    async def _tokens(self):
+        '''Generate the tokens of the input.
+        '''
+        # pylint: disable=protected-access
+        pending = bytearray()
+        # The offset of pending in the input.
+        base = 0
+        # Only scan again once pending has grown past that size, so that a
+        # token spanning many chunks is not scanned over and over.
+        wanted = 0
+        count = 0
+        async for chunk in self._chunks():
+            self.line_index.extend(chunk, base + len(pending))
+            pending += chunk
+            if len(pending) < wanted:
+                continue
+            end = 0
+            for token, end in self._make(
+                pending, base,
+                lexer._scan(
+                    pending, final=False, line_index=self.line_index, base=base
+                )
+            ):
+                yield token
+                count += 1
+                if count % YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
+            # pending cannot be resized while it is being scanned.
+            if end:
+                del pending[:end]
+                base += end
+                wanted = 0
+            else:
+                wanted = 2 * len(pending)
+        for token, _ in self._make(
+            pending, base,
+            lexer._scan(pending, line_index=self.line_index, base=base)
+        ):
+            yield token
+            count += 1
+            if count % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+    def __aiter__(self):
+        return self._tokens()
@@ -0,0 +1,163 @@
+# pylint: disable=missing-docstring
+
+import asyncio
+import glob
+import pathlib
+import random
+import unittest
+
+import async_lexer
+import corpus
+import lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+async def _iterate(chunks):
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+def _split(data, sizes):
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        size = sizes()
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def _tokenize(stream, **kwargs):
+
+    async def collect():
+        return [
+            token
+            async for token in async_lexer.AsyncTokenizer(stream, **kwargs)
+        ]
+
+    return asyncio.run(collect())
+
+
+class TestAsyncTokenizer(unittest.TestCase):
+
+    def _check(self, data, chunks, msg=None):
+        expected = list(lexer.Tokenizer.from_buffer(data))
+        tokens = _tokenize(_iterate(chunks))
+        self.assertEqual(tokens, expected, msg=msg)
+        self.assertEqual([(token.span, token.line, token.column)
+                          for token in tokens],
+                         [(token.span, token.line, token.column)
+                          for token in expected],
+                         msg=msg)
+
+    def test_realfiles(self):
+        rand = random.Random(0)
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'rb') as f:
+                data = f.read()
+            for max_size in (1, 7, 100, 4096):
+                chunks = _split(data, lambda: rand.randint(1, max_size))
+                self._check(data, chunks, msg=(src_path, max_size))
+
+    def test_every_split(self):
+        text = '#[=[c]=] a("b\\\\" [=[c]=]) # d\n e(f\\;g "\\"")\n#[[x'
+        data = text.encode()
+        for split in range(len(data) + 1):
+            self._check(data, [data[:split], data[split:]], msg=split)
+
+    def test_corpus(self):
+        text, count = corpus.generate(200000, seed=5)
+        data = text.encode()
+        rand = random.Random(1)
+        chunks = _split(data, lambda: rand.randint(1, 5000))
+        tokens = _tokenize(_iterate(chunks))
+        self.assertEqual(len(tokens), count)
+
+    def test_long_token(self):
+        data = b'set(' + b'x' * 100000 + b' "' + b'y' * 100000 + b'")\n'
+        self._check(data, _split(data, lambda: 10))
+
+    def test_utf8_split(self):
+        data = 'set(\u00e9\u00e9 "\u20ac")'.encode()
+        self._check(data, [data[i:i + 1] for i in range(len(data))])
+
+    def test_stream_reader(self):
+        with open(str(DATA_DIR / '3.txt'), 'rb') as f:
+            data = f.read()
+
+        async def collect():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            tokenizer = async_lexer.AsyncTokenizer(reader, chunk_size=1000)
+            return [token async for token in tokenizer]
+
+        self.assertEqual(
+            asyncio.run(collect()), list(lexer.Tokenizer.from_buffer(data))
+        )
+
+    def test_errors(self):
+        for data in (b'a(b\\q)', b'\n\n  "\\q"', b'[=x'):
+            with self.assertRaises(ValueError) as expected:
+                list(lexer.Tokenizer.from_buffer(data))
+            with self.assertRaises(ValueError) as cm:
+                _tokenize(_iterate([data[:2], data[2:]]))
+            self.assertEqual(cm.exception.args, expected.exception.args)
+
+    def test_errors_split_character(self):
+        for text in ('a(b\\\u00e9)', 'x\\\u20ac', '[=\u00e9', 'a\\\U0001f600'):
+            data = text.encode()
+            with self.assertRaises(ValueError) as expected:
+                list(lexer.Tokenizer.from_buffer(data))
+            for split in range(len(data) + 1):
+                with self.assertRaises(ValueError, msg=split) as cm:
+                    _tokenize(_iterate([data[:split], data[split:]]))
+                self.assertEqual(
+                    cm.exception.args, expected.exception.args, msg=split
+                )
+
+    def test_large_chunk(self):
+        # The tokens before the error are generated before the end of the
+        # chunk is scanned.
+        data = b'a ' * 100000 + b'"\\q"'
+
+        async def run():
+            tokens = []
+            with self.assertRaises(ValueError):
+                async for token in async_lexer.AsyncTokenizer(_iterate([data])):
+                    tokens.append(token)
+            return tokens
+
+        self.assertEqual(len(asyncio.run(run())), 100000)
+
+    def test_does_not_starve_the_loop(self):
+        data = b'a ' * 10000
+
+        async def run():
+            ticks = 0
+            done = False
+
+            async def tick():
+                nonlocal ticks
+                while not done:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(tick())
+            count = 0
+            async for _ in async_lexer.AsyncTokenizer(_iterate([data, b'\n'])):
+                count += 1
+            done = True
+            await task
+            return count, ticks
+
+        count, ticks = asyncio.run(run())
+        self.assertEqual(count, 10000)
+        self.assertGreaterEqual(ticks, 10000 // async_lexer.YIELD_EVERY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+'''Measure the per-token overhead saved by Tokenizer.iter_batches().
+
+Tokenizes a source generated by the corpus module, without locations, and
+sends the tokens to a consumer process through a multiprocessing.Queue, one
+token per put() or one batch of tokens per put().  Reports the tokens/s of the
+whole pipeline, and of iterating in this process alone, for each engine and
+batch size.
+'''
+
+import argparse
+import multiprocessing
+import time
+
+import corpus
+import lexer
+
+
+def consume(queue, counts):
+    '''Count the tokens received from queue until None, then report them.
+    '''
+    count = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        count += len(item) if isinstance(item, list) else 1
+    counts.put(count)
+
+
+def pipeline(text, engine, size):
+    '''Time sending the tokens of text to a consumer process.
+
+    :param size: The batch size, or None to put one token at a time.
+
+    :return: A (seconds, number of tokens) tuple.
+    '''
+    queue = multiprocessing.Queue()
+    counts = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=consume, args=(queue, counts))
+    consumer.start()
+    start = time.perf_counter()
+    tokenizer = lexer.Tokenizer.from_string(
+        text, engine=engine, locations=False
+    )
+    if size is None:
+        for token in tokenizer:
+            queue.put(token)
+    else:
+        for batch in tokenizer.iter_batches(size):
+            queue.put(batch)
+    queue.put(None)
+    count = counts.get()
+    seconds = time.perf_counter() - start
+    consumer.join()
+    return seconds, count
+
+
+def in_process(text, engine, size):
+    '''Time iterating over the tokens of text in this process.
+
+    :return: A (seconds, number of tokens) tuple.
+    '''
+    start = time.perf_counter()
+    tokenizer = lexer.Tokenizer.from_string(
+        text, engine=engine, locations=False
+    )
+    count = 0
+    if size is None:
+        for _ in tokenizer:
+            count += 1
+    else:
+        for batch in tokenizer.iter_batches(size):
+            count += len(batch)
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--size',
+        type=float,
+        default=1,
+        help='size of the generated source, in MB (default: 1)'
+    )
+    parser.add_argument(
+        '--batch',
+        type=int,
+        action='append',
+        help='batch size, may be repeated (default: 16, 256, 4096)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of timings to take'
+    )
+    args = parser.parse_args()
+    text = corpus.generate(int(args.size * 1e6), mix={'nested': 4})[0]
+    sizes = [None] + (args.batch or [16, 256, 4096])
+    print(
+        '%-14s %-8s %14s %14s' %
+        ('engine', 'batch', 'queue tok/s', 'iter tok/s')
+    )
+    for engine in lexer.ENGINES:
+        for size in sizes:
+            seconds, count = min(
+                pipeline(text, engine, size) for _ in range(args.repeat)
+            )
+            alone, _ = min(
+                in_process(text, engine, size) for _ in range(args.repeat)
+            )
+            print(
+                '%-14s %-8s %14.0f %14.0f' %
+                (engine, size or '-', count / seconds, count / alone)
+            )
+
+
+if __name__ == '__main__':
+    main()
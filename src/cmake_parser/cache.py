@@ -0,0 +1,348 @@
+'''Caches of the tokens of cmake sources.
+
+A DiskCache stores the token_table.TokenTable of each source it sees in a
+directory, under the sha256 of the content of the source and of lexer.VERSION.
+Sources that did not change since they were last tokenized are then loaded
+from the cache instead of being lexed again.
+
+A MemoryCache keeps the TokenTables of recently used files in memory and
+checks them against the stat of the file, for processes that tokenize the same
+files over and over.
+
+Both can be passed as the cache argument of lexer.Tokenizer.from_file() and of
+the functions of the tree module.
+'''
+
+import array
+import collections
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+
+import lexer
+import source
+import token_table
+
+# Header of an entry: magic, lexer.VERSION, item size of the offset arrays and
+# number of tokens.  Followed by the kinds, starts and ends arrays in native
+# byte order.
+_MAGIC = b'CMTT'
+_HEADER = struct.Struct('=4sIII')
+
+# The default bound on the total size of the entries of a cache.
+MAX_BYTES = 1 << 30
+
+# The default fraction of max_bytes that evict() brings the entries down to, so
+# that the puts that follow an eviction do not evict again.
+LOW_WATER = 0.75
+
+
+class DiskCache(object):
+    '''A directory of tokenized sources, shared by any number of processes.
+
+    Entries are written to a temporary file and renamed into place, so readers
+    never see a partial entry and concurrent writers of the same entry are
+    harmless.  Reading an entry touches its modification time.  When the
+    entries grow past max_bytes, the least recently used ones are removed
+    until they take no more than low_water times max_bytes.
+
+    A DiskCache is picklable, so it can be handed to worker processes.  Each
+    process only knows the size of the entries it writes, so it measures the
+    size of the whole directory again once its own writes since the last
+    measure reach the room between max_bytes and the low water mark divided by
+    the number of CPUs.  As many processes as CPUs writing at once thus go
+    past max_bytes by no more than that room before one of them evicts, while
+    the directory is only walked that often.
+    '''
+
+    # Whether the cache keeps the buffers of the tables it returns, which must
+    # then not be closed by their callers.
+    KEEPS_BUFFERS = False
+
+    def __init__(self, directory, *, max_bytes=MAX_BYTES, low_water=LOW_WATER):
+        '''Create a DiskCache, and its directory if missing.
+
+        :param directory: The directory of the cache.
+        :param max_bytes: The bound on the total size of the entries.
+        :param low_water: The fraction of max_bytes evict() brings the total
+            size of the entries down to.
+        '''
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.low_bytes = int(max_bytes * low_water)
+        os.makedirs(self.directory, exist_ok=True)
+        self._measure_every = max(
+            1, (max_bytes - self.low_bytes) // (os.cpu_count() or 1)
+        )
+        # The size of the entries when last measured, and the size of the
+        # entries written by this process since then.
+        self._size = self._total_size()
+        self._written = 0
+
+    @staticmethod
+    def key(buffer):
+        '''Get the key of a source: a hex digest of its content and type.
+
+        str and bytes-like sources get different keys because the offsets of
+        their tokens count characters and bytes respectively.
+        '''
+        digest = hashlib.sha256(b'%d\0' % lexer.VERSION)
+        if isinstance(buffer, str):
+            digest.update(b'str\0')
+            digest.update(buffer.encode())
+        else:
+            digest.update(b'bytes\0')
+            digest.update(buffer)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        '''Get the path of the entry of a key.
+
+        Entries are spread over 256 subdirectories.
+        '''
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def _entries(self):
+        '''Generate the (path, stat) of all entries.
+        '''
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    pass
+
+    def _total_size(self):
+        '''Get the total size of all entries.
+        '''
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def get(self, buffer, *, encoding='utf-8', errors='strict'):
+        '''Load the TokenTable of a source.
+
+        :param buffer: The source, as given to lexer.tokenize_to_table().
+        :param encoding: Encoding of a bytes-like buffer.
+        :param errors: The error handler used to decode a bytes-like buffer.
+
+        :return: The TokenTable, or None if the source is not cached.
+        '''
+        path = self._path(self.key(buffer))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        kinds = array.array('B')
+        starts = array.array('I')
+        ends = array.array('I')
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, itemsize, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != lexer.VERSION \
+                or itemsize != starts.itemsize \
+                or len(data) != _HEADER.size + count * (1 + 2 * itemsize):
+            return None
+        view = memoryview(data)
+        offset = _HEADER.size
+        kinds.frombytes(view[offset:offset + count])
+        offset += count
+        starts.frombytes(view[offset:offset + count * itemsize])
+        offset += count * itemsize
+        ends.frombytes(view[offset:])
+        return token_table.TokenTable(
+            source.Source(buffer, encoding=encoding, errors=errors), kinds,
+            starts, ends
+        )
+
+    def put(self, buffer, table):
+        '''Store the TokenTable of a source.
+        '''
+        path = self._path(self.key(buffer))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        header = _HEADER.pack(
+            _MAGIC, lexer.VERSION, table.starts.itemsize, len(table)
+        )
+        with tempfile.NamedTemporaryFile(
+            dir=directory, prefix='.', delete=False
+        ) as f:
+            try:
+                f.write(header)
+                f.write(table.kinds)
+                f.write(table.starts)
+                f.write(table.ends)
+                f.close()
+                os.replace(f.name, path)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        self._written += len(header) \
+                + len(table) * (1 + 2 * table.starts.itemsize)
+        if self._size + self._written > self.max_bytes \
+                or self._written >= self._measure_every:
+            self._size = self._total_size()
+            self._written = 0
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def tokenize_file(
+        self, filename, *, memory_map=False, binary=True, errors='strict'
+    ):
+        '''Get the TokenTable of a file from the cache, or tokenize it.
+
+        :param memory_map: If True, the file is mapped into memory instead of
+            being read, and binary is ignored.  The map is owned by the caller.
+        :param binary: If True, the file is read as bytes and the offsets are
+            byte offsets.  Otherwise it is decoded upfront, as with open(), and
+            the offsets count characters.
+        :param errors: The error handler used to decode the file.
+        '''
+        if memory_map:
+            return self.tokenize(lexer.map_file(filename), errors=errors)
+        if binary:
+            with open(str(filename), 'rb') as f:
+                return self.tokenize(f.read(), errors=errors)
+        with open(str(filename), 'r', errors=errors) as f:
+            return self.tokenize(f.read())
+
+    def tokenize(self, buffer, *, encoding='utf-8', errors='strict'):
+        '''Get the TokenTable of a source from the cache, or tokenize it.
+
+        Sources that are tokenized are added to the cache.
+        '''
+        table = self.get(buffer, encoding=encoding, errors=errors)
+        if table is None:
+            table = lexer.tokenize_to_table(
+                buffer, encoding=encoding, errors=errors
+            )
+            self.put(buffer, table)
+        return table
+
+    def evict(self):
+        '''Remove the least recently used entries until they fit low_bytes.
+        '''
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if size <= self.low_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+        self._size = size
+        self._written = 0
+
+
+# The default bounds of a MemoryCache.
+MAX_ENTRIES = 1024
+MAX_MEMORY_BYTES = 256 << 20
+
+
+class MemoryCache(object):
+    '''A bounded in-memory LRU cache of the TokenTables of files.
+
+    Entries are keyed by the path of the file as given, and by whether it was
+    read as bytes or decoded and with which error handler.  They are validated
+    by the modification time of the file, in nanoseconds, and its size, so a
+    hit costs one os.stat().  A change that keeps both the same is not noticed.
+
+    The size of an entry is the size of the file plus the size of the arrays of
+    its table.  Least recently used entries are evicted when there are more
+    than max_entries or their sizes add up to more than max_bytes.
+
+    hits, misses and evictions count what happened so far.  A MemoryCache can
+    be shared by threads.
+    '''
+
+    # Whether the cache keeps the buffers of the tables it returns, which must
+    # then not be closed by their callers.
+    KEEPS_BUFFERS = True
+
+    def __init__(self, *, max_entries=MAX_ENTRIES, max_bytes=MAX_MEMORY_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # Maps (path, binary, errors) keys to (mtime_ns, size, table, bytes)
+        # tuples, least recently used first.
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        '''The total size of the entries, in bytes.
+        '''
+        return self._size
+
+    def tokenize_file(
+        self, filename, *, memory_map=False, binary=True, errors='strict'
+    ):
+        '''Get the TokenTable of a file from the cache, or tokenize it.
+
+        :param memory_map: Same as binary.  Entries hold a bytes copy of their
+            file rather than a memory map of it, so that a full cache keeps no
+            file descriptor open.
+        :param binary: If True, the file is read as bytes and the offsets are
+            byte offsets.  Otherwise it is decoded upfront, as with open(), and
+            the offsets count characters.
+        :param errors: The error handler used to decode the file.
+        '''
+        path = str(filename)
+        binary = binary or memory_map
+        key = path, binary, errors
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stat.st_mtime_ns \
+                    and entry[1] == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        if binary:
+            with open(path, 'rb') as f:
+                buffer = f.read()
+        else:
+            with open(path, 'r', errors=errors) as f:
+                buffer = f.read()
+        table = lexer.tokenize_to_table(buffer, errors=errors)
+        self._put(key, stat, table)
+        return table
+
+    def _put(self, key, stat, table):
+        '''Add the table of a file and evict entries over the bounds.
+
+        This is an internal method and MUST NOT be used publicly.
+        '''
+        size = stat.st_size + len(table) * (1 + 2 * table.starts.itemsize)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[3]
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, table, size)
+            self._size += size
+            while len(self._entries) > self.max_entries \
+                    or self._size > self.max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                self._size -= entry[3]
+                self.evictions += 1
+
+    def clear(self):
+        '''Remove all entries.  The counters are kept.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+'''Compare loading tokens from a cache.DiskCache against lexing again.
+
+For each file, reports the best time of tokenizing it into a TokenTable and of
+loading the same table from a warm cache, hashing of the content included.
+'''
+
+import argparse
+import pathlib
+import shutil
+import tempfile
+import timeit
+
+import cache
+import lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'files',
+        nargs='*',
+        default=[str(DATA_DIR / '3.txt')],
+        help='cmake files to tokenize (default: test_data/3.txt)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=20, help='number of timings to take'
+    )
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    try:
+        disk_cache = cache.DiskCache(directory)
+        for filename in args.files:
+            with open(filename, 'rb') as f:
+                buffer = f.read()
+            disk_cache.tokenize(buffer)
+            lex = min(
+                timeit.repeat(
+                    lambda: lexer.tokenize_to_table(buffer),
+                    number=1,
+                    repeat=args.repeat
+                )
+            )
+            load = min(
+                timeit.repeat(
+                    lambda: disk_cache.get(buffer),
+                    number=1,
+                    repeat=args.repeat
+                )
+            )
+            print(
+                '%s\tlex: %.2fms\tload: %.2fms\t(%.1f%%)' %
+                (filename, lex * 1e3, load * 1e3, load / lex * 100)
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
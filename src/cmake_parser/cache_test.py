@@ -0,0 +1,269 @@
+# pylint: disable=missing-docstring
+
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import cache
+import interning
+import lexer
+import tree
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+def _check_from_file(test, token_cache):
+    '''Check that from_file(cache=token_cache) is the same as without it.
+    '''
+    path = str(DATA_DIR / '3.txt')
+    for kwargs in [{}, {'binary': True}, {'memory_map': True}]:
+        with lexer.Tokenizer.from_file(path, **kwargs) as tokenizer:
+            expected = [(token.KIND, token.orig_text, token.span)
+                        for token in tokenizer]
+        with lexer.Tokenizer.from_file(
+            path, cache=token_cache, **kwargs
+        ) as tokenizer:
+            tokens = [(token.KIND, token.orig_text, token.span)
+                      for token in tokenizer]
+        test.assertEqual(tokens, expected, msg=kwargs)
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'CMakeLists.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('# h\u00e9llo w\u00f6rld\nset(\u00e4 b)')
+        tokens = list(lexer.Tokenizer.from_file(path, cache=token_cache))
+        test.assertEqual(tokens[1].orig_text, 'set')
+        test.assertEqual(tokens[1].offset, 14)
+        test.assertEqual((tokens[4].line, tokens[4].column), (2, 7))
+        intern_table = interning.InternTable()
+        for _ in range(2):
+            tokens = list(
+                lexer.Tokenizer.from_file(
+                    path,
+                    cache=token_cache,
+                    locations=False,
+                    intern_table=intern_table
+                )
+            )
+            test.assertIsNone(tokens[1].offset)
+            test.assertIs(tokens[1].orig_text, intern_table.intern('set'))
+        with test.assertRaises(ValueError):
+            lexer.Tokenizer.from_file(path, cache=token_cache, engine='bogus')
+    finally:
+        shutil.rmtree(directory)
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.DiskCache(self.directory)
+        with open(str(DATA_DIR / '3.txt'), 'rb') as f:
+            self.buffer = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _entry_count(self):
+        return sum(
+            len(filenames) for _, _, filenames in os.walk(self.directory)
+        )
+
+    def test_tokenize(self):
+        self.assertIsNone(self.cache.get(self.buffer))
+        expected = list(lexer.tokenize_to_table(self.buffer))
+        self.assertEqual(list(self.cache.tokenize(self.buffer)), expected)
+        self.assertEqual(self._entry_count(), 1)
+        table = self.cache.get(self.buffer)
+        self.assertEqual(list(table), expected)
+        self.assertEqual([token.span for token in table],
+                         [token.span for token in expected])
+        with mock.patch.object(lexer, 'tokenize_to_table') as tokenize:
+            self.cache.tokenize(self.buffer)
+            self.assertFalse(tokenize.called)
+
+    def test_key(self):
+        text = 'a(b)'
+        self.assertNotEqual(
+            cache.DiskCache.key(text), cache.DiskCache.key(text.encode())
+        )
+        self.assertEqual(
+            cache.DiskCache.key(b'a(b)'),
+            cache.DiskCache.key(memoryview(b'a(b)'))
+        )
+        key = cache.DiskCache.key(text)
+        with mock.patch.object(lexer, 'VERSION', lexer.VERSION + 1):
+            self.assertNotEqual(cache.DiskCache.key(text), key)
+
+    def test_str(self):
+        text = 'set(é x)'
+        self.cache.tokenize(text)
+        table = self.cache.get(text)
+        self.assertEqual(list(table), list(lexer.tokenize_to_table(text)))
+        self.assertIsNone(self.cache.get(text.encode()))
+
+    def test_corrupt_entry(self):
+        self.cache.tokenize(self.buffer)
+        # pylint: disable=protected-access
+        path = self.cache._path(self.cache.key(self.buffer))
+        with open(path, 'r+b') as f:
+            f.truncate(100)
+        self.assertIsNone(self.cache.get(self.buffer))
+        self.cache.tokenize(self.buffer)
+        self.assertIsNotNone(self.cache.get(self.buffer))
+
+    def test_evict(self):
+        buffers = [b'a(%d)' % i for i in range(10)]
+        entry_size = 16 + 4 * 9
+        small = cache.DiskCache(
+            self.directory, max_bytes=5 * entry_size, low_water=0.6
+        )
+        for i, buffer in enumerate(buffers):
+            small.tokenize(buffer)
+            # pylint: disable=protected-access
+            path = small._path(small.key(buffer))
+            os.utime(path, (i, i))
+        # Evicted down to 3 entries by the 6th and the 9th entries.
+        self.assertEqual(self._entry_count(), 4)
+        for buffer in buffers[:6]:
+            self.assertIsNone(small.get(buffer))
+        for buffer in buffers[6:]:
+            self.assertIsNotNone(small.get(buffer))
+
+    def test_evict_shared(self):
+        entry_size = 16 + 4 * 9
+        max_bytes = 20 * entry_size
+        with mock.patch.object(os, 'cpu_count', return_value=2):
+            workers = [
+                cache.DiskCache(
+                    self.directory, max_bytes=max_bytes, low_water=0.5
+                ) for _ in range(2)
+            ]
+        for i in range(100):
+            workers[i % 2].tokenize(b'a(%d)' % i)
+            self.assertLessEqual(
+                self._entry_count() * entry_size, max_bytes * 3 // 2
+            )
+        self.assertIsNotNone(workers[0].get(b'a(99)'))
+
+    def test_from_file(self):
+        _check_from_file(self, self.cache)
+        # The file read as text and as bytes, then the other file.
+        self.assertEqual(self._entry_count(), 3)
+
+    def test_parse_tree(self):
+        root = pathlib.Path(tempfile.mkdtemp())
+        try:
+            for src_path in DATA_DIR.glob('*.txt'):
+                shutil.copy(
+                    str(src_path), str(root / (src_path.stem + '.cmake'))
+                )
+            expected = {
+                path: list(table)
+                for path, table in tree.parse_tree(root)
+            }
+            self.assertTrue(expected)
+            for jobs in (1, 2):
+                results = tree.parse_tree(root, jobs=jobs, cache=self.cache)
+                self.assertEqual({
+                    path: list(table)
+                    for path, table in results
+                }, expected)
+            self.assertEqual(self._entry_count(), len(expected))
+        finally:
+            shutil.rmtree(str(root))
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = pathlib.Path(tempfile.mkdtemp())
+        self.paths = []
+        for i in range(4):
+            path = self.directory / ('%d.cmake' % i)
+            path.write_bytes(b'a(%d)' % i)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(str(self.directory))
+
+    def test_hit(self):
+        memory_cache = cache.MemoryCache()
+        path = self.paths[0]
+        table = memory_cache.tokenize_file(path)
+        self.assertEqual(list(table), list(lexer.tokenize_to_table(b'a(0)')))
+        with mock.patch.object(lexer, 'tokenize_to_table') as tokenize:
+            self.assertIs(memory_cache.tokenize_file(path), table)
+            self.assertFalse(tokenize.called)
+        self.assertEqual((memory_cache.hits, memory_cache.misses), (1, 1))
+        self.assertEqual(len(memory_cache), 1)
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc')
+    def test_no_open_files(self):
+        paths = []
+        for i in range(64):
+            path = self.directory / ('many%d.cmake' % i)
+            path.write_bytes(b'a(%d)' % i)
+            paths.append(path)
+        memory_cache = cache.MemoryCache()
+        count = len(os.listdir('/proc/self/fd'))
+        for path in paths:
+            memory_cache.tokenize_file(path, memory_map=True)
+        self.assertEqual(len(memory_cache), len(paths))
+        self.assertEqual(len(os.listdir('/proc/self/fd')), count)
+        table = memory_cache.tokenize_file(paths[0], memory_map=True)
+        self.assertEqual(table[0].orig_text, 'a')
+
+    def test_invalidation(self):
+        memory_cache = cache.MemoryCache()
+        path = self.paths[0]
+        memory_cache.tokenize_file(path)
+        path.write_bytes(b'bb(0)')
+        table = memory_cache.tokenize_file(path)
+        self.assertEqual(table[0].orig_text, 'bb')
+        stat = path.stat()
+        path.write_bytes(b'cc(0)')
+        os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(memory_cache.tokenize_file(path)[0].orig_text, 'cc')
+        self.assertEqual((memory_cache.hits, memory_cache.misses), (0, 3))
+        self.assertEqual(len(memory_cache), 1)
+        self.assertEqual(memory_cache.evictions, 0)
+
+    def test_max_entries(self):
+        memory_cache = cache.MemoryCache(max_entries=2)
+        for path in self.paths[:3]:
+            memory_cache.tokenize_file(path)
+        memory_cache.tokenize_file(self.paths[1])
+        memory_cache.tokenize_file(self.paths[3])
+        self.assertEqual(len(memory_cache), 2)
+        self.assertEqual(memory_cache.evictions, 2)
+        memory_cache.tokenize_file(self.paths[1])
+        self.assertEqual(memory_cache.hits, 2)
+
+    def test_max_bytes(self):
+        entry_size = 4 + 4 * 9
+        memory_cache = cache.MemoryCache(max_bytes=3 * entry_size)
+        for path in self.paths:
+            memory_cache.tokenize_file(path)
+        self.assertEqual(len(memory_cache), 3)
+        self.assertEqual(memory_cache.size, 3 * entry_size)
+        self.assertEqual(memory_cache.evictions, 1)
+        memory_cache.clear()
+        self.assertEqual((len(memory_cache), memory_cache.size), (0, 0))
+
+    def test_from_file(self):
+        memory_cache = cache.MemoryCache()
+        _check_from_file(self, memory_cache)
+        self.assertEqual((memory_cache.hits, memory_cache.misses), (3, 3))
+        results = list(
+            tree.parse_tree(self.directory, jobs=1, cache=memory_cache)
+        )
+        self.assertEqual(len(results), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,61 +2,126 @@
 '''
 
 import io
+import re
+
+import source
 
 
 class CharStream(io.IOBase):
     # pylint: disable=too-many-public-methods
     # pylint: disable=missing-docstring
     '''Readonly character stream with single character lookup ahead.
+
+    The underlying stream is read in blocks of block_size characters.  The
+    current position is an index into the current block, so that consuming a
+    character never copies the rest of the block.
+
+    The line_index attribute is a source.LineIndex of the blocks read so far.
+
+    Use it as a context manager to close the underlying stream on exit, and
+    reset() it to read another stream with the same object.
     '''
 
-    def __init__(self, stream):  # pylint: disable=super-init-not-called
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, stream, *, block_size=BLOCK_SIZE):
+        # pylint: disable=super-init-not-called
+        if block_size < 1:
+            raise ValueError(block_size, 'is not a positive block size.')
+        self._block_size = block_size
+        self._stream = None
+        self.reset(stream)
+
+    def reset(self, stream):
+        '''Close the current stream and start reading another one.
+
+        line_index becomes a new source.LineIndex, so the one of the previous
+        stream stays valid for the tokens referring to it.
+        '''
         if not isinstance(stream, io.IOBase):
             raise TypeError(stream, 'is not an instance of io.IOBase.')
         if not stream.readable():
             raise TypeError(stream, 'is not readable.')
+        if self._stream is not None:
+            self._stream.close()
         self._stream = stream
         self._buffer = ''
+        self._index = 0
+        self._base = 0
+        self.line_index = source.LineIndex()
+
+    def _fill(self):
+        '''Read the next block if the current one has been consumed.
+
+        :return: False if the stream has been exhausted, True otherwise.
+        '''
+        if self._index < len(self._buffer):
+            return True
+        self._base += len(self._buffer)
+        self._buffer = self._stream.read(self._block_size)
+        self._index = 0
+        self.line_index.extend(self._buffer, self._base)
+        return bool(self._buffer)
+
+    @property
+    def offset(self):
+        '''The number of characters consumed so far.
+        '''
+        return self._base + self._index
 
     def curr(self):
         '''Peek the current character without moving the stream.
 
         If it already reached the EOF, None is returned.
         '''
-        if not self._buffer:
-            try:
-                self._buffer = next(self._stream)
-                return self._buffer[0]
-            except StopIteration:
-                return
-        if self._buffer:
-            return self._buffer[0]
+        if self._index < len(self._buffer) or self._fill():
+            return self._buffer[self._index]
 
     def is_eof(self):
         '''Check if the stream has been exhausted.
 
-        May conditionally read one symbol into buffer.
+        May conditionally read one block into buffer.
         '''
-        if self._buffer:
-            return False
-        try:
-            self._buffer = next(self._stream)
-            return False
-        except StopIteration:
-            return True
+        return not (self._index < len(self._buffer) or self._fill())
 
     def __next__(self):
-        if self._buffer:
-            char = self._buffer[0]
-            self._buffer = self._buffer[1:]
-            return char
-        return next(self._stream)
+        if self._index >= len(self._buffer) and not self._fill():
+            raise StopIteration
+        char = self._buffer[self._index]
+        self._index += 1
+        return char
+
+    __REGEX_CACHE__ = {}
+
+    def read_until(self, chars):
+        '''Consume characters up to, but excluding, any one of chars.
+
+        Stops at the EOF if none of chars is found.
+
+        :param chars: The characters to stop at.
+        :type chars: str
+
+        :return: The consumed characters, possibly empty.
+        '''
+        regex = self.__class__.__REGEX_CACHE__.get(chars)
+        if regex is None:
+            regex = re.compile('[^%s]*' % re.escape(chars))
+            self.__class__.__REGEX_CACHE__[chars] = regex
+        pieces = []
+        while self._fill():
+            start = self._index
+            self._index = regex.match(self._buffer, start).end()
+            pieces.append(self._buffer[start:self._index])
+            if self._index < len(self._buffer):
+                break
+        return ''.join(pieces)
 
     def close(self):
         self._stream.close()
 
+    @property
     def closed(self):
-        return self._stream.closed()
+        return self._stream.closed
 
     def isatty(self):
         return False
@@ -71,10 +136,10 @@ class CharStream(io.IOBase):
         return True
 
     def __enter__(self):
-        raise io.UnsupportedOperation
+        return self
 
     def __exit__(self, *unused_args):
-        raise io.UnsupportedOperation
+        self.close()
 
     def __iter__(self):
         raise io.UnsupportedOperation
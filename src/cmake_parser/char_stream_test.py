@@ -29,6 +29,30 @@ class TestCharStream(unittest.TestCase):
         with self.assertRaises(io.UnsupportedOperation):
             g.writelines([])
 
+    def test_context_manager(self):
+        stream = io.StringIO('foo')
+        with char_stream.CharStream(stream) as g:
+            self.assertEqual(next(g), 'f')
+            self.assertFalse(g.closed)
+        self.assertTrue(stream.closed)
+        self.assertTrue(g.closed)
+
+    def test_reset(self):
+        first = io.StringIO('a\nb')
+        g = char_stream.CharStream(first, block_size=2)
+        self.assertEqual(g.read_until('b'), 'a\n')
+        line_index = g.line_index
+        second = io.StringIO('cd\ne')
+        g.reset(second)
+        self.assertTrue(first.closed)
+        self.assertEqual(g.offset, 0)
+        self.assertEqual(g.read_until('x'), 'cd\ne')
+        self.assertTrue(g.is_eof())
+        self.assertEqual(line_index.position(2), (2, 1))
+        self.assertEqual(g.line_index.position(4), (2, 2))
+        with self.assertRaises(TypeError):
+            g.reset('foo')
+
     def test_is_eof(self):
         string = 'foo'
         g = char_stream.CharStream(io.StringIO(string))
@@ -48,6 +72,49 @@ class TestCharStream(unittest.TestCase):
             self.assertEqual(next(g), ch)
         self.assertIsNone(g.curr())
 
+    def test_block_size(self):
+        string = 'foo\nbar baz\n'
+        for block_size in range(1, len(string) + 2):
+            g = char_stream.CharStream(
+                io.StringIO(string), block_size=block_size
+            )
+            chars = []
+            while not g.is_eof():
+                self.assertEqual(g.curr(), g.curr())
+                chars.append(next(g))
+            self.assertEqual(''.join(chars), string, msg=block_size)
+            self.assertIsNone(g.curr())
+            with self.assertRaises(StopIteration):
+                next(g)
+
+        with self.assertRaises(ValueError):
+            char_stream.CharStream(io.StringIO(string), block_size=0)
+
+    def test_read_until(self):
+        string = 'foo bar(baz)'
+        for block_size in range(1, len(string) + 2):
+            g = char_stream.CharStream(
+                io.StringIO(string), block_size=block_size
+            )
+            self.assertEqual(g.read_until(' ('), 'foo')
+            self.assertEqual(g.read_until(' ('), '')
+            self.assertEqual(next(g), ' ')
+            self.assertEqual(g.read_until('()'), 'bar')
+            self.assertEqual(g.curr(), '(')
+            self.assertEqual(g.read_until('\\'), '(baz)')
+            self.assertTrue(g.is_eof())
+            self.assertEqual(g.read_until(')'), '')
+
+    def test_offset(self):
+        string = 'foo\nbar\n'
+        g = char_stream.CharStream(io.StringIO(string), block_size=2)
+        for i in range(len(string)):
+            self.assertEqual(g.offset, i)
+            next(g)
+        self.assertEqual(g.offset, len(string))
+        self.assertTrue(g.is_eof())
+        self.assertEqual(list(g.line_index.line_starts), [0, 4, 8])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+'''Generate synthetic cmake sources of any size.
+
+The sources are made of random command invocations whose arguments are drawn
+from a tunable mix of the constructs of the cmake language: bracket arguments
+with varying = depth, quoted arguments with escape sequences, long unquoted
+lists, bracket and line comments, and deeply nested parentheses.  Pathological
+cases, such as megabyte long single lines, can be mixed in as well.
+
+Generation is deterministic for a given seed and mix, and the number of tokens
+of each source is known by construction, so benchmarks and linear time checks
+can use the sources without tokenizing them first.
+'''
+
+import argparse
+import json
+import os
+import random
+
+# The constructs that can be mixed, with their default weights.
+MIX = {
+    'unquoted': 8,
+    'unquoted_list': 2,
+    'quoted': 3,
+    'bracket': 1,
+    'bracket_comment': 1,
+    'line_comment': 1,
+    'nested': 1,
+    'long_line': 0,
+}
+
+# The size of the single line generated by the long_line construct.
+LONG_LINE_SIZE = 1 << 20
+
+_NAMES = [
+    'add_library', 'add_executable', 'target_link_libraries', 'set', 'list',
+    'if', 'endif', 'foreach', 'endforeach', 'message', 'option',
+    'include_directories', 'add_subdirectory', 'install'
+]
+_WORD_CHARS = 'abcdefghijklmnopqrstuvwxyz' \
+              'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-/'
+_ESCAPES = ['\\n', '\\t', '\\r', '\\"', '\\\\', '\\;', '\\$', '\\\n']
+
+
+class Generator(object):
+    '''A seeded generator of cmake sources.
+
+    Every generating method returns a (text, number of tokens) tuple.
+    '''
+
+    def __init__(self, seed=0, *, mix=None, long_line_size=LONG_LINE_SIZE):
+        '''Create a Generator.
+
+        :param seed: The seed of the random generator.
+        :param mix: A dict mapping names of MIX to weights, overriding the
+            default weights.
+        :param long_line_size: The size of the lines of the long_line construct.
+        '''
+        weights = dict(MIX)
+        if mix:
+            unknown = set(mix) - set(MIX)
+            if unknown:
+                raise ValueError(sorted(unknown), 'are not in', sorted(MIX))
+            weights.update(mix)
+        self._constructs = [name for name in sorted(weights) if weights[name]]
+        if not self._constructs:
+            raise ValueError('the mix has no constructs')
+        self._weights = [weights[name] for name in self._constructs]
+        self._random = random.Random(seed)
+        self.long_line_size = long_line_size
+
+    def word(self, max_length=12):
+        '''Get a random word that is a valid unquoted argument.
+        '''
+        rand = self._random
+        return ''.join(rand.choices(_WORD_CHARS, k=rand.randint(1, max_length)))
+
+    def unquoted(self):
+        '''Get an unquoted argument.
+        '''
+        return self.word(), 1
+
+    def unquoted_list(self):
+        '''Get an unquoted argument holding a long ;-separated list.
+        '''
+        items = [self.word() for _ in range(self._random.randint(10, 200))]
+        return ';'.join(items), 1
+
+    def quoted(self):
+        '''Get a quoted argument with escape sequences.
+        '''
+        rand = self._random
+        parts = []
+        for _ in range(rand.randint(1, 12)):
+            if rand.random() < 0.3:
+                parts.append(rand.choice(_ESCAPES))
+            else:
+                parts.append(self.word())
+            parts.append(rand.choice(' ;()#['))
+        return '"' + ''.join(parts) + '"', 1
+
+    def _bracket(self, newlines):
+        '''Get a bracket argument, with newlines in its content or not.
+        '''
+        rand = self._random
+        depth = rand.randint(0, 4)
+        close = ']' + '=' * depth + ']'
+        while True:
+            parts = []
+            for _ in range(rand.randint(1, 12)):
+                parts.append(self.word())
+                parts.append(
+                    rand.choice([' ', ' ', ']', '=', '"', '\\', '(', ')', '#'] +
+                                (['\n'] if newlines else []))
+                )
+            content = ''.join(parts)
+            if (content + close).find(close) == len(content):
+                break
+        return '[' + '=' * depth + '[' + content + close, 1
+
+    def bracket(self):
+        '''Get a bracket argument, possibly spanning several lines.
+        '''
+        return self._bracket(newlines=True)
+
+    def bracket_comment(self):
+        '''Get a bracket comment, followed by a newline.
+        '''
+        # A bracket comment ends at the end of its line in this tokenizer, so
+        # its content has no newline.
+        text, _ = self._bracket(newlines=False)
+        return '#' + text + '\n', 1
+
+    def line_comment(self):
+        '''Get a line comment, followed by a newline.
+        '''
+        return '# ' + ' '.join(
+            self.word() for _ in range(self._random.randint(0, 8))
+        ) + '\n', 1
+
+    def nested(self):
+        '''Get an argument in up to 32 levels of parentheses.
+        '''
+        depth = self._random.randint(1, 32)
+        return '(' * depth + self.word() + ')' * depth, 2 * depth + 1
+
+    def long_line(self):
+        '''Get unquoted arguments making a line of long_line_size.
+        '''
+        parts = []
+        count = 0
+        size = 0
+        while size < self.long_line_size:
+            word = self.word()
+            parts.append(word)
+            size += len(word) + 1
+            count += 1
+        return ' '.join(parts), count
+
+    def argument(self):
+        '''Get an argument, or a comment, of a random construct.
+        '''
+        construct = self._random.choices(self._constructs, self._weights)[0]
+        return getattr(self, construct)()
+
+    def command(self):
+        '''Get a command invocation, followed by a newline.
+        '''
+        rand = self._random
+        parts = [rand.choice(_NAMES), '(']
+        count = 2
+        for _ in range(rand.randint(0, 8)):
+            text, tokens = self.argument()
+            parts.append(text)
+            parts.append(' ' if not text.endswith('\n') else '')
+            count += tokens
+        parts.append(')\n')
+        return ''.join(parts), count + 1
+
+    def source(self, size):
+        '''Get a source of at least size characters.
+        '''
+        parts = []
+        count = 0
+        length = 0
+        while length < size:
+            text, tokens = self.command()
+            parts.append(text)
+            count += tokens
+            length += len(text)
+        return ''.join(parts), count
+
+
+def generate(size, *, seed=0, mix=None, long_line_size=LONG_LINE_SIZE):
+    '''Generate a source of at least size characters.
+
+    :return: A (text, number of tokens) tuple.
+    '''
+    return Generator(seed, mix=mix, long_line_size=long_line_size).source(size)
+
+
+def write_tree(
+    root, files, file_size, *, seed=0, mix=None, long_line_size=LONG_LINE_SIZE
+):
+    '''Write a tree of generated cmake sources.
+
+    The tree has a CMakeLists.txt file in each directory and *.cmake modules,
+    and an expected.json file mapping the path of each source, relative to
+    root, to its number of tokens.
+
+    :param files: The number of sources.
+    :param file_size: The size of each source, in characters.
+
+    :return: The dict written to expected.json.
+    '''
+    # pylint: disable=too-many-arguments
+    generator = Generator(seed, mix=mix, long_line_size=long_line_size)
+    expected = {}
+    for i in range(files):
+        directory = os.path.join(*['d%d' % (i // 10**k % 10) for k in (2, 1)])
+        if i % 3:
+            path = os.path.join(directory, 'module%d.cmake' % i)
+        else:
+            path = os.path.join(directory, 'sub%d' % i, 'CMakeLists.txt')
+        text, count = generator.source(file_size)
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), 'w') as f:
+            f.write(text)
+        expected[path] = count
+    with open(os.path.join(root, 'expected.json'), 'w') as f:
+        json.dump(expected, f, indent=2, sort_keys=True)
+    return expected
+
+
+def _parse_mix(text):
+    '''Parse a name=weight,... mix from the command line.
+    '''
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        mix[name] = int(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root', help='directory to write the tree to')
+    parser.add_argument(
+        '--files', type=int, default=100, help='number of sources'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=64 * 1024,
+        help='size of each source, in characters'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument(
+        '--mix',
+        type=_parse_mix,
+        help='weights overriding the defaults, e.g., bracket=5,long_line=1; '
+        'defaults: %s' %
+        ','.join('%s=%d' % item for item in sorted(MIX.items()))
+    )
+    parser.add_argument(
+        '--long-line-size',
+        type=int,
+        default=LONG_LINE_SIZE,
+        help='size of the lines of the long_line construct'
+    )
+    args = parser.parse_args()
+    expected = write_tree(
+        args.root,
+        args.files,
+        args.size,
+        seed=args.seed,
+        mix=args.mix,
+        long_line_size=args.long_line_size
+    )
+    print('%d sources, %d tokens' % (len(expected), sum(expected.values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# pylint: disable=missing-docstring
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import corpus
+import lexer
+import tree
+
+
+class TestGenerator(unittest.TestCase):
+
+    def _check(self, text, count):
+        self.assertEqual(sum(1 for _ in lexer.iter_spans(text)), count)
+
+    def test_constructs(self):
+        for construct in sorted(corpus.MIX):
+            for seed in range(20):
+                text, count = corpus.generate(
+                    2000,
+                    seed=seed,
+                    mix={name: name == construct
+                         for name in corpus.MIX},
+                    long_line_size=1000
+                )
+                self.assertGreaterEqual(len(text), 2000)
+                self._check(text, count)
+
+    def test_state_machine(self):
+        text, count = corpus.generate(20000, seed=1)
+        self.assertEqual(
+            sum(1 for _ in lexer.Tokenizer.from_string(text)), count
+        )
+
+    def test_deterministic(self):
+        self.assertEqual(
+            corpus.generate(5000, seed=3), corpus.generate(5000, seed=3)
+        )
+        self.assertNotEqual(
+            corpus.generate(5000, seed=3), corpus.generate(5000, seed=4)
+        )
+
+    def test_long_line(self):
+        mix = {name: name == 'long_line' for name in corpus.MIX}
+        text, count = corpus.generate(100001, mix=mix, long_line_size=100000)
+        self.assertGreater(max(len(line) for line in text.split('\n')), 100000)
+        self._check(text, count)
+
+    def test_bad_mix(self):
+        with self.assertRaises(ValueError):
+            corpus.Generator(mix={'unknown': 1})
+        with self.assertRaises(ValueError):
+            corpus.Generator(mix={name: 0 for name in corpus.MIX})
+
+
+class TestWriteTree(unittest.TestCase):
+
+    def test_write_tree(self):
+        root = tempfile.mkdtemp()
+        try:
+            expected = corpus.write_tree(root, 12, 3000, seed=2)
+            self.assertEqual(len(expected), 12)
+            with open(os.path.join(root, 'expected.json'), 'r') as f:
+                self.assertEqual(json.load(f), expected)
+            counts = {
+                os.path.relpath(str(path), root): len(table)
+                for path, table in tree.parse_tree(root, jobs=1)
+            }
+            self.assertEqual(counts, expected)
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+'''Event driven parsing of cmake sources.
+
+Instead of building a tree, parse_events() walks the tokens once and calls back
+the handlers registered for the commands and comments it meets.  This is the
+cheapest way to extract a few facts from many files, e.g., the names of all
+the targets added by add_library().
+'''
+
+import ast
+import source
+import tok
+
+
+def parse_events(
+    buffer,
+    *,
+    handlers=None,
+    on_command=None,
+    on_comment=None,
+    encoding='utf-8'
+):
+    '''Parse a cmake source and call back handlers for its commands.
+
+    A handler is called as handler(name, arguments, span), where name is the
+    command name as written in the source, arguments is the list of argument
+    tokens, comments excluded, and span is the (start, end) offsets of the
+    whole invocation.  Argument tokens are spans over the buffer and nested
+    parentheses are kept as tok.Bra and tok.Ket tokens, as in
+    ast.CommandInvocation.
+
+    The commands are found by ast.walk_spans(), so a source is accepted or
+    rejected as by ast.AstParser.  The arguments of a command are only turned
+    into tokens if some handler wants them.
+
+    :param buffer: A str, or a bytes-like object such as bytes, memoryview or
+        mmap.mmap, in which case the offsets are byte offsets.
+    :param handlers: A dict mapping command names to the handler of the
+        invocations of that command.  cmake command names are case
+        insensitive, and so are the keys.
+    :param on_command: If not None, the handler of all command invocations,
+        called after the handler from handlers, if any.
+    :param on_comment: If not None, called as on_comment(token) with every
+        tok.Comment, including the ones among arguments.
+    :param encoding: Encoding used to decode the text of a token from a
+        bytes-like buffer.
+    '''
+    src = source.Source(buffer, encoding=encoding)
+    handlers = {
+        name.lower(): handler
+        for name, handler in (handlers or {}).items()
+    }
+    classes = tok.CLASSES
+
+    comment = None
+    if on_comment is not None:
+
+        def comment(span):
+            _, start, end = span
+            on_comment(tok.Comment(None, src, start, end))
+
+    for name, first, arguments, last in ast.walk_spans(src, on_comment=comment):
+        handler = handlers.get(name.lower())
+        if handler is None and on_command is None:
+            continue
+        arguments = [
+            classes[kind](None, src, start, end)
+            for kind, start, end in arguments
+        ]
+        span = (first[1], last[2])
+        if handler is not None:
+            handler(name, arguments, span)
+        if on_command is not None:
+            on_command(name, arguments, span)
@@ -0,0 +1,121 @@
+# pylint: disable=missing-docstring
+
+import glob
+import pathlib
+import unittest
+
+import ast
+import events
+import tok
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+class TestParseEvents(unittest.TestCase):
+
+    TEXT = '''# comment
+add_library(foo # inline comment
+    "foo.cc" [[foo.h]])
+ADD_LIBRARY(bar bar.cc)
+if((a OR b) AND c)
+endif()
+'''
+
+    def test_handlers(self):
+        calls = []
+        events.parse_events(
+            self.TEXT,
+            handlers={
+                'add_library': lambda *args: calls.append(args),
+            }
+        )
+        self.assertEqual(
+            calls, [
+                (
+                    'add_library', [
+                        tok.UnquotedArgument('foo'),
+                        tok.QuotedArgument('"foo.cc"'),
+                        tok.BracketArgument('[[foo.h]]'),
+                    ], (10, 66)
+                ),
+                (
+                    'ADD_LIBRARY', [
+                        tok.UnquotedArgument('bar'),
+                        tok.UnquotedArgument('bar.cc'),
+                    ], (67, 90)
+                ),
+            ]
+        )
+
+    def test_handler_case(self):
+        for key in ('Add_Library', 'ADD_LIBRARY'):
+            names = []
+            events.parse_events(
+                self.TEXT,
+                handlers={
+                    key: lambda name, *unused: names.append(name)
+                }
+            )
+            self.assertEqual(names, ['add_library', 'ADD_LIBRARY'], msg=key)
+
+    def test_on_command(self):
+        calls = []
+        events.parse_events(
+            self.TEXT,
+            on_command=lambda name, arguments, span: calls.append(name)
+        )
+        self.assertEqual(calls, ['add_library', 'ADD_LIBRARY', 'if', 'endif'])
+
+    def test_on_comment(self):
+        comments = []
+        events.parse_events(
+            self.TEXT, on_comment=lambda token: comments.append(token)
+        )
+        self.assertEqual(
+            comments, [
+                tok.Comment('# comment'),
+                tok.Comment('# inline comment'),
+            ]
+        )
+        self.assertEqual(comments[1].line, 2)
+
+    def test_bytes(self):
+        names = []
+        events.parse_events(
+            self.TEXT.encode(),
+            handlers={
+                'add_library':
+                lambda name, arguments, span: names.append(arguments[0].value),
+            }
+        )
+        self.assertEqual(names, ['foo', 'bar'])
+
+    def test_errors(self):
+        for text in (
+            '"a"()', 'a b', 'a)', '1abc()', 'a-b()', '(', 'a(b', 'a #c\n',
+            'a\n  b'
+        ):
+            with self.assertRaises(ValueError, msg=text) as expected:
+                ast.AstParser.from_string(text).parse()
+            with self.assertRaises(ValueError, msg=text) as context:
+                events.parse_events(text)
+            self.assertEqual(context.exception.args, expected.exception.args)
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'r') as f:
+                text = f.read()
+            commands = []
+            events.parse_events(
+                text,
+                on_command=lambda *args: commands.
+                append(ast.CommandInvocation(*args))
+            )
+            self.assertEqual(
+                commands, list(ast.AstParser.from_string(text)), msg=src_path
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
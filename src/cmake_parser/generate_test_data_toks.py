@@ -5,15 +5,14 @@
 import glob
 import pathlib
 
-import lexer
+import tree
 
 THIS_DIR = pathlib.Path(__file__).resolve().parent
 DATA_DIR = THIS_DIR / 'test_data'
 
 if __name__ == '__main__':
-    for src_path in glob.glob(str(DATA_DIR / '*.txt')):
-        g = lexer.Tokenizer.from_file(src_path)
+    for src_path, table in tree.parse_files(glob.glob(str(DATA_DIR / '*.txt'))):
         toks_path = src_path[:-len('txt')] + 'toks'
         with open(toks_path, 'w') as f:
-            for token in g:
+            for token in table:
                 print(token, file=f)
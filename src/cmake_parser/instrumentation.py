@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+'''Find out where the time of the state machine tokenizer goes.
+
+InstrumentedTokenizer is a lexer.Tokenizer that records, into a Stats object,
+the number of _iterate() calls made in each state, the tokens emitted and the
+characters consumed per token class, and the time spent tokenizing each file.
+lexer.Tokenizer itself is left untouched, so tokenizing without instrumentation
+costs exactly what it did.
+
+Run as a script to get the stats of some files.
+'''
+
+import argparse
+import collections
+import io
+import json
+import sys
+import time
+
+import char_stream
+import lexer
+
+
+class Stats(object):
+    '''Counters accumulated over any number of tokenized files.
+    '''
+
+    def __init__(self):
+        # Maps names of lexer states to the number of _iterate() calls.
+        self.iterations = collections.Counter()
+        # Maps names of token classes to numbers of tokens and characters.
+        self.tokens = collections.Counter()
+        self.chars = collections.Counter()
+        # (name, seconds, characters) of each file.
+        self.files = []
+
+    @property
+    def seconds(self):
+        '''The total time spent tokenizing all files.
+        '''
+        return sum(seconds for _, seconds, _ in self.files)
+
+    def to_dict(self):
+        '''Get the stats as a dict of JSON serializable values.
+        '''
+        return collections.OrderedDict([
+            ('iterations', dict(self.iterations)),
+            ('tokens', dict(self.tokens)),
+            ('chars', dict(self.chars)),
+            ('seconds', self.seconds),
+            (
+                'files', [
+                    collections.OrderedDict([
+                        ('name', name),
+                        ('seconds', seconds),
+                        ('chars', chars),
+                    ]) for name, seconds, chars in self.files
+                ]
+            ),
+        ])
+
+    def dump(self, f):
+        '''Write the stats to a file as JSON.
+        '''
+        json.dump(self.to_dict(), f, indent=2)
+
+    def report(self, f=sys.stdout):
+        '''Write a human readable summary of the stats.
+        '''
+        total = sum(self.iterations.values())
+        print(
+            '%d files, %.3fs, %d iterations' %
+            (len(self.files), self.seconds, total),
+            file=f
+        )
+        for name, count in self.iterations.most_common():
+            print(
+                '  %-24s %10d iterations %5.1f%%' %
+                (name, count, count / total * 100),
+                file=f
+            )
+        for name, count in self.tokens.most_common():
+            print(
+                '  %-24s %10d tokens %10d chars' %
+                (name, count, self.chars[name]),
+                file=f
+            )
+
+
+class InstrumentedTokenizer(lexer.Tokenizer):
+    '''A state machine tokenizer recording what it does into a Stats.
+
+    Only the time spent in the tokenizer is counted, however the tokens are
+    pulled: with __iter__(), __next__() or iter_batches().  A file is added to
+    the stats at its end, or by reset() or close() if it was not read whole.
+    '''
+
+    @classmethod
+    def from_string(cls, text, *, stats=None, locations=True, name='<string>'):
+        '''Create an InstrumentedTokenizer from a string.
+
+        :param stats: The Stats to record into.  A new one if None.
+        :param name: The name of the source in the stats.
+        '''
+        # pylint: disable=arguments-differ
+        return cls(
+            char_stream.CharStream(io.StringIO(text)),
+            stats=stats,
+            locations=locations,
+            name=name
+        )
+
+    @classmethod
+    def from_file(cls, filename, *, stats=None, locations=True):
+        '''Create an InstrumentedTokenizer from a CMakeLists.txt file.
+
+        :param stats: The Stats to record into.  A new one if None.
+        '''
+        # pylint: disable=arguments-differ
+        return cls(
+            char_stream.CharStream(open(str(filename), 'r')),
+            stats=stats,
+            locations=locations,
+            name=str(filename)
+        )
+
+    def __init__(self, stream, *, stats=None, locations=True, name=None):
+        '''Create an InstrumentedTokenizer.
+
+        :param stats: The Stats to record into.  A new one if None.
+        :param name: The name of the source in the stats.
+        '''
+        super().__init__(stream, locations=locations)
+        self.stats = Stats() if stats is None else stats
+        self._name = name
+        # Counted by lexer._State rather than by name, which is cheaper, and
+        # added to the stats at the end of the file.
+        self._iterations = collections.Counter()
+        self._seconds = 0.0
+        self._flushed = False
+
+    def reset(self, stream, *, name=None):
+        '''Close the current source and start tokenizing another one.
+
+        :param name: The name of the new source in the stats.
+        '''
+        # pylint: disable=arguments-differ
+        self._flush()
+        super().reset(stream)
+        self._name = name
+        self._seconds = 0.0
+        self._flushed = False
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def _iterate(self):
+        self._iterations[self._state] += 1
+        return super()._iterate()
+
+    def _emit(self, clazz):
+        token = super()._emit(clazz)
+        name = clazz.__name__
+        self.stats.tokens[name] += 1
+        self.stats.chars[name] += len(token.orig_text)
+        return token
+
+    def _next_token(self):
+        start = time.perf_counter()
+        token = super()._next_token()
+        self._seconds += time.perf_counter() - start
+        if token is None:
+            self._flush()
+        return token
+
+    def _flush(self):
+        '''Add the iterations and the time of the file to the stats, once.
+
+        This is an internal method and MUST NOT be used publicly.
+        '''
+        if self._flushed:
+            return
+        self._flushed = True
+        for state, count in self._iterations.items():
+            self.stats.iterations[state.name] += count
+        self._iterations.clear()
+        self.stats.files.append(
+            (self._name, self._seconds, self._stream.offset)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='+', help='cmake files to tokenize')
+    parser.add_argument('--json', help='file to write the stats to as JSON')
+    args = parser.parse_args()
+    stats = Stats()
+    for filename in args.files:
+        for _ in InstrumentedTokenizer.from_file(filename, stats=stats):
+            pass
+    stats.report()
+    if args.json:
+        with open(args.json, 'w') as f:
+            stats.dump(f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# pylint: disable=missing-docstring
+
+import glob
+import io
+import json
+import pathlib
+import unittest
+
+import instrumentation
+import lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+class TestInstrumentedTokenizer(unittest.TestCase):
+
+    def test_counts(self):
+        text = 'foo(bar "baz") # c\n'
+        g = instrumentation.InstrumentedTokenizer.from_string(text)
+        self.assertEqual(list(g), list(lexer.Tokenizer.from_string(text)))
+        stats = g.stats
+        self.assertEqual(
+            stats.tokens, {
+                'UnquotedArgument': 2,
+                'Bra': 1,
+                'Ket': 1,
+                'QuotedArgument': 1,
+                'Comment': 1,
+            }
+        )
+        self.assertEqual(stats.chars['UnquotedArgument'], 6)
+        self.assertEqual(stats.chars['QuotedArgument'], 5)
+        self.assertEqual(stats.chars['Comment'], 3)
+        self.assertGreater(stats.iterations['Start'], 0)
+        self.assertGreater(stats.iterations['QuotedArgument'], 0)
+        self.assertEqual(len(stats.files), 1)
+        name, seconds, chars = stats.files[0]
+        self.assertEqual(name, '<string>')
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(chars, len(text))
+
+    def test_shared_stats(self):
+        stats = instrumentation.Stats()
+        paths = sorted(glob.glob(str(DATA_DIR / '*.txt')))
+        count = 0
+        for src_path in paths:
+            tokens = list(
+                instrumentation.InstrumentedTokenizer.from_file(
+                    src_path, stats=stats
+                )
+            )
+            self.assertEqual(
+                tokens, list(lexer.Tokenizer.from_file(src_path)), msg=src_path
+            )
+            count += len(tokens)
+        self.assertEqual(sum(stats.tokens.values()), count)
+        self.assertEqual([name for name, _, _ in stats.files], paths)
+        self.assertNotIn('End', stats.iterations)
+
+    def test_reset(self):
+        with instrumentation.InstrumentedTokenizer.from_string('a(b)') as g:
+            list(g)
+            g.reset(io.StringIO('c d\n'), name='second')
+            self.assertEqual(len(list(g)), 2)
+        self.assertEqual([(name, chars) for name, _, chars in g.stats.files],
+                         [('<string>', 4), ('second', 4)])
+        self.assertEqual(sum(g.stats.tokens.values()), 6)
+
+    def test_next(self):
+        text = 'a(b c)\n'
+        g = instrumentation.InstrumentedTokenizer.from_string(text)
+        tokens = []
+        token = next(g)
+        while token is not None:
+            tokens.append(token)
+            token = next(g)
+        self.assertEqual(tokens, list(lexer.Tokenizer.from_string(text)))
+        self._check_stats(g.stats, text, 5)
+
+    def test_iter_batches(self):
+        text = 'a(b c)\n'
+        g = instrumentation.InstrumentedTokenizer.from_string(text)
+        batches = list(g.iter_batches(2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self._check_stats(g.stats, text, 5)
+
+    def test_close_early(self):
+        g = instrumentation.InstrumentedTokenizer.from_string('a(b c)\n')
+        with g:
+            next(g)
+        self.assertEqual([(name, chars) for name, _, chars in g.stats.files],
+                         [('<string>', 1)])
+
+    def _check_stats(self, stats, text, count):
+        self.assertEqual(sum(stats.tokens.values()), count)
+        self.assertGreater(stats.iterations['Start'], 0)
+        self.assertEqual(len(stats.files), 1)
+        name, seconds, chars = stats.files[0]
+        self.assertEqual(name, '<string>')
+        self.assertGreater(seconds, 0)
+        self.assertEqual(chars, len(text))
+
+    def test_dump(self):
+        g = instrumentation.InstrumentedTokenizer.from_string('a(b)')
+        list(g)
+        f = io.StringIO()
+        g.stats.dump(f)
+        data = json.loads(f.getvalue())
+        self.assertEqual(data['tokens']['Bra'], 1)
+        self.assertEqual(data['files'][0]['chars'], 4)
+        self.assertEqual(
+            sorted(data), ['chars', 'files', 'iterations', 'seconds', 'tokens']
+        )
+        report = io.StringIO()
+        g.stats.report(report)
+        self.assertIn('1 files', report.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+'''Share the strings of repeated token texts and values.
+
+The same arguments, e.g., PUBLIC, PRIVATE, ${CMAKE_CURRENT_SOURCE_DIR} or
+common source file names, show up over and over in the sources of a tree, each
+as a separate str object when the tokens own their text.  An InternTable maps
+each distinct string it sees to a single instance of it, so tokens retained
+from a whole tree share the memory of their repeated texts.
+
+The table is bounded: once it holds max_entries strings, new strings are
+returned as is and the table stops growing, so its own memory stays flat
+however many sources go through it.  Strings longer than max_length, which
+rarely repeat, are never added.
+
+Pass an InternTable as the intern_table argument of lexer.Tokenizer.from_file()
+or lexer.Tokenizer.from_string() to intern the text and the value of the
+tokens.
+
+Run as a script to get the bytes saved on the tokens of some files.
+'''
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+import lexer
+import tree
+
+# The default bounds of an InternTable.
+MAX_ENTRIES = 1 << 20
+MAX_LENGTH = 256
+
+
+class InternTable(object):
+    '''A bounded table of shared strings, meant to live for a whole run.
+
+    hits, misses and rejected count the strings found in the table, added to
+    it, and neither found nor added.  bytes_saved is the total size of the
+    strings found in the table, i.e., of the duplicates that the callers can
+    drop in favor of the shared instances.
+    '''
+
+    def __init__(self, *, max_entries=MAX_ENTRIES, max_length=MAX_LENGTH):
+        '''Create an InternTable.
+
+        :param max_entries: The number of strings after which the table stops
+            growing.
+        :param max_length: The length of the longest string to add.
+        '''
+        self.max_entries = max_entries
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.bytes_saved = 0
+        self._size = 0
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __contains__(self, text):
+        return text in self._strings
+
+    @property
+    def size(self):
+        '''The total size of the strings of the table, in bytes.
+        '''
+        return self._size
+
+    def intern(self, text):
+        '''Get the shared instance of text.
+
+        :return: The string of the table equal to text.  text itself if the
+            table has none and text was added to it, or if it is full or text
+            is too long.
+        '''
+        shared = self._strings.get(text)
+        if shared is not None:
+            self.hits += 1
+            if shared is not text:
+                self.bytes_saved += sys.getsizeof(text)
+            return shared
+        if len(self._strings) >= self.max_entries \
+                or len(text) > self.max_length:
+            self.rejected += 1
+            return text
+        self.misses += 1
+        self._strings[text] = text
+        self._size += sys.getsizeof(text)
+        return text
+
+    def clear(self):
+        '''Remove all the strings and reset the counters.
+        '''
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.bytes_saved = 0
+        self._size = 0
+        self._strings.clear()
+
+    def report(self, f=sys.stdout):
+        '''Write a human readable summary of the counters.
+        '''
+        print(
+            '%d strings, %d bytes; %d hits, %d misses, %d rejected; '
+            '%d bytes saved' % (
+                len(self), self.size, self.hits, self.misses, self.rejected,
+                self.bytes_saved
+            ),
+            file=f
+        )
+
+
+def retained_memory(paths, intern_table=None):
+    '''Tokenize files and measure the memory taken by all their tokens.
+
+    Tokens carry no location, so that they do not keep their sources alive.
+    Their values are computed, so that the memoized ones are counted too.
+
+    :return: A (number of tokens, bytes) tuple.
+    '''
+    tracemalloc.start()
+    try:
+        tokens = []
+        for path in paths:
+            tokens.extend(
+                lexer.Tokenizer.from_file(
+                    path,
+                    engine='regex',
+                    locations=False,
+                    intern_table=intern_table
+                )
+            )
+        for token in tokens:
+            token.value  # pylint: disable=pointless-statement
+        return len(tokens), tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'paths',
+        nargs='+',
+        help='cmake files, or directories to find cmake files in'
+    )
+    parser.add_argument(
+        '--max-entries',
+        type=int,
+        default=MAX_ENTRIES,
+        help='number of strings after which the table stops growing'
+    )
+    args = parser.parse_args()
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(tree.find_files(path))
+        else:
+            paths.append(path)
+    count, plain = retained_memory(paths)
+    intern_table = InternTable(max_entries=args.max_entries)
+    _, interned = retained_memory(paths, intern_table)
+    print(
+        '%d files, %d tokens: %d bytes retained, %d bytes interned' %
+        (len(paths), count, plain, interned)
+    )
+    intern_table.report()
+
+
+if __name__ == '__main__':
+    main()
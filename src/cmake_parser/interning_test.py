@@ -0,0 +1,120 @@
+# pylint: disable=missing-docstring
+
+import glob
+import io
+import pathlib
+import unittest
+
+import interning
+import lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+class TestInternTable(unittest.TestCase):
+
+    def test_intern(self):
+        table = interning.InternTable()
+        first = ''.join(['PUB', 'LIC'])
+        second = ''.join(['PU', 'BLIC'])
+        self.assertIsNot(first, second)
+        self.assertIs(table.intern(first), first)
+        self.assertIs(table.intern(second), first)
+        self.assertIs(table.intern(first), first)
+        self.assertIn('PUBLIC', table)
+        self.assertEqual(len(table), 1)
+        self.assertEqual((table.hits, table.misses, table.rejected), (2, 1, 0))
+        self.assertGreater(table.bytes_saved, len('PUBLIC'))
+        self.assertGreater(table.size, 0)
+
+    def test_bounds(self):
+        table = interning.InternTable(max_entries=2, max_length=4)
+        for text in ['a', 'b', 'c', 'a', 'abcde']:
+            table.intern(text)
+        self.assertEqual(len(table), 2)
+        self.assertNotIn('c', table)
+        self.assertNotIn('abcde', table)
+        self.assertEqual((table.hits, table.misses, table.rejected), (1, 2, 2))
+        c = ''.join(['c', ''])
+        self.assertIs(table.intern(c), c)
+        self.assertEqual(len(table), 2)
+
+    def test_clear(self):
+        table = interning.InternTable()
+        table.intern('a')
+        table.intern('a')
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertEqual((table.hits, table.misses, table.size), (0, 0, 0))
+
+    def test_report(self):
+        table = interning.InternTable()
+        table.intern('a')
+        f = io.StringIO()
+        table.report(f)
+        self.assertIn('1 strings', f.getvalue())
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_engines(self):
+        text = 'set(PUBLIC "PUBLIC" PUBLIC)\nset(PUBLIC)\n'
+        expected = list(lexer.Tokenizer.from_string(text))
+        for engine in lexer.ENGINES:
+            for locations in (True, False):
+                table = interning.InternTable()
+                tokens = list(
+                    lexer.Tokenizer.from_string(
+                        text,
+                        engine=engine,
+                        locations=locations,
+                        intern_table=table
+                    )
+                )
+                self.assertEqual(tokens, expected)
+                texts = [token.orig_text for token in tokens]
+                self.assertIs(texts[2], texts[4])
+                self.assertIs(texts[0], texts[6])
+                self.assertIs(texts[2], texts[8])
+                values = [token.value for token in tokens]
+                self.assertIs(values[2], texts[2])
+                self.assertIs(values[3], texts[2])
+                self.assertEqual(table.hits, 6)
+
+    def test_quoted_values(self):
+        text = 'set("a;b" "a;b" a\\;b)'
+        for engine in lexer.ENGINES:
+            table = interning.InternTable()
+            tokens = list(
+                lexer.Tokenizer.from_string(
+                    text, engine=engine, intern_table=table
+                )
+            )
+            values = [token.value for token in tokens]
+            self.assertEqual(values[2:5], ['a;b'] * 3)
+            self.assertIs(values[2], values[3])
+            self.assertIs(values[2], values[4])
+
+    def test_realfiles(self):
+        table = interning.InternTable()
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            self.assertEqual(
+                list(lexer.Tokenizer.from_file(src_path, intern_table=table)),
+                list(lexer.Tokenizer.from_file(src_path)),
+                msg=src_path
+            )
+        self.assertGreater(table.hits, table.misses)
+
+    def test_retained_memory(self):
+        paths = [str(DATA_DIR / '3.txt')] * 4
+        count, plain = interning.retained_memory(paths)
+        table = interning.InternTable()
+        interned_count, interned = interning.retained_memory(paths, table)
+        self.assertEqual(interned_count, count)
+        self.assertLess(interned, plain)
+        self.assertGreater(table.bytes_saved, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
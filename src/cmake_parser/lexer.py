@@ -9,12 +9,18 @@ elements and how they SHOULD be quoted are:
         a" "b"c"d               "a\" \"b\"c\"d"
 '''
 
+import bisect
 import enum
 import io
+import itertools
+import mmap
+import os
 import re
 
 import char_stream
+import source
 import tok
+import token_table
 
 
 def is_whitespace(char):
@@ -61,32 +67,309 @@ class _State(enum.Enum):
     End = -1
 
 
+# Bumped whenever the tokens produced for some input change, which invalidates
+# the tokens cached by cache.DiskCache.
+VERSION = 1
+
+ENGINES = ('state_machine', 'regex')
+
+# The engine used by Tokenizer.from_string() and Tokenizer.from_file() when the
+# caller does not ask for one explicitly.
+DEFAULT_ENGINE = 'state_machine'
+
+# Tokenizer.relex() moves all the tokens to their current offsets and lets
+# their source forget its edits once it is made of more pieces than that.
+MAX_PIECES = 256
+
+
+def _check_engine(engine):
+    '''Resolve and validate the name of a tokenizer engine.
+    '''
+    if engine is None:
+        engine = DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(engine, 'is not one of', ENGINES)
+    return engine
+
+
+def map_file(filename):
+    '''Map a whole file into memory for reading.
+
+    :return: A read-only mmap.mmap, or an empty bytes for an empty file, which
+        cannot be mapped.
+    '''
+    with open(str(filename), 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 class Tokenizer(object):
     '''Tokenize a CMakeLists.txt file.
     '''
 
     @classmethod
-    def from_string(cls, text):
+    def from_string(
+        cls, text, *, engine=None, locations=True, intern_table=None
+    ):
         '''Create a Tokenizer from a string.
+
+        :param engine: One of ENGINES.  Defaults to DEFAULT_ENGINE.  All
+            engines produce the same tokens.
+        :param locations: If True, tokens know their offset, line and column.
+        :param intern_table: If not None, an interning.InternTable the text
+            and the value of the tokens are interned in.
         '''
-        return cls(char_stream.CharStream(io.StringIO(text)))
+        if _check_engine(engine) == 'regex':
+            return RegexTokenizer(
+                text, locations=locations, intern_table=intern_table
+            )
+        return cls(
+            char_stream.CharStream(io.StringIO(text)),
+            locations=locations,
+            intern_table=intern_table
+        )
 
     @classmethod
-    def from_file(cls, filename):
+    def from_file(
+        cls,
+        filename,
+        *,
+        engine=None,
+        locations=True,
+        binary=False,
+        memory_map=False,
+        errors='strict',
+        cache=None,
+        intern_table=None
+    ):
         '''Create a Tokenizer from a CMakeLists.txt file.
+
+        :param engine: One of ENGINES.  Defaults to DEFAULT_ENGINE.  The regex
+            engine reads the whole file into memory upfront.
+        :param locations: If True, tokens know their offset, line and column.
+        :param binary: If True, read the whole file as bytes and lex the raw
+            UTF-8 bytes, as with from_buffer(), instead of decoding the whole
+            file upfront.  engine and locations are ignored.  Tokens are spans
+            over the bytes and decode their text only when asked for it, so a
+            file whose comments are not valid UTF-8 can still be tokenized.
+        :param memory_map: If True, lex straight from a read-only memory map of
+            the file.  Same as binary, except that the map is closed by close()
+            or reset(), e.g., on leaving a with block, or else once the
+            tokenizer and all its tokens are gone.  The text of the tokens can
+            no longer be read once the map is closed.
+        :param errors: The error handler used to decode the file, e.g.,
+            'replace'.  With binary or memory_map, only the text of the tokens
+            that are asked for is decoded.
+        :param cache: If not None, a cache.DiskCache or cache.MemoryCache to
+            get the spans of the tokens of the file from, or to store them in
+            if missing.  The tokens, their offsets and the tokenizer are the
+            same as without a cache, except that the regex engine is always
+            used.
+        :param intern_table: If not None, an interning.InternTable the text
+            and the value of the tokens are interned in.  Ignored with binary
+            or memory_map, whose span tokens hold no text.
         '''
-        return cls(char_stream.CharStream(open(str(filename), 'r')))
+        # pylint: disable=too-many-arguments
+        if cache is not None:
+            _check_engine(engine)
+            binary = binary or memory_map
+            table = cache.tokenize_file(
+                filename, memory_map=memory_map, binary=binary, errors=errors
+            )
+            return RegexTokenizer.from_table(
+                table,
+                spans=binary,
+                locations=locations,
+                intern_table=intern_table,
+                closing=memory_map and not cache.KEEPS_BUFFERS
+            )
+        if memory_map:
+            return RegexTokenizer(
+                map_file(filename), spans=True, errors=errors, closing=True
+            )
+        if binary:
+            with open(str(filename), 'rb') as f:
+                return cls.from_buffer(f.read(), errors=errors)
+        if _check_engine(engine) == 'regex':
+            with open(str(filename), 'r', errors=errors) as f:
+                return RegexTokenizer(
+                    f.read(), locations=locations, intern_table=intern_table
+                )
+        return cls(
+            char_stream.CharStream(open(str(filename), 'r', errors=errors)),
+            locations=locations,
+            intern_table=intern_table
+        )
+
+    @classmethod
+    def from_buffer(cls, buffer, *, encoding='utf-8', errors='strict'):
+        '''Create a Tokenizer whose tokens are spans over a shared buffer.
+
+        Tokens do not own their text.  They only hold their offsets into the
+        buffer and compute orig_text and value on demand.  Each token is still
+        a small object with its own start offset, so keeping all of them costs
+        about as much memory as keeping tokens owning short texts.  Use
+        iter_spans() or tokenize_to_table() to walk or keep the tokens of a
+        large source without a token object each.  Always uses the regex
+        engine.
+
+        :param buffer: A str, or a bytes-like object such as bytes, memoryview
+            or mmap.mmap, in which case the offsets are byte offsets.
+        :param encoding: Encoding used to decode the text of a token from a
+            bytes-like buffer.
+        :param errors: The error handler used to decode that text.
+        '''
+        return RegexTokenizer(
+            buffer, spans=True, encoding=encoding, errors=errors
+        )
+
+    @classmethod
+    def relex(
+        cls, previous_tokens, edit_start, edit_end, new_text, *, src=None
+    ):
+        '''Update the tokens of a source after replacing a part of it.
+
+        Replaces source[edit_start:edit_end] with new_text in the source.Source
+        the tokens refer to.  Lexing restarts after the last token ending
+        before the edit and stops at the first token after the edit that lines
+        up with one of previous_tokens, so the work done is proportional to the
+        size of the edit rather than the size of the source.  Tokens before the
+        edit are reused as they are.  Tokens after it are reused without being
+        touched: the source moves their offsets lazily, see
+        source.Source.locate().  Once the source is made of more than
+        MAX_PIECES pieces, all the tokens are moved to their current offsets
+        and the source forgets its edits.
+
+        :param previous_tokens: The list of tokens of the whole source, e.g.,
+            from Tokenizer.from_buffer() or from the regex engine, or a
+            previous relex().  It is updated in place.  Other tokens referring
+            to the source are not kept up to date.
+        :param edit_start: The offset of the start of the edited part in the
+            previous source.
+        :param edit_end: The offset of the end of the edited part in the
+            previous source.
+        :param new_text: The replacing text: a str for str sources, bytes for
+            bytes-like ones.
+        :param src: The source.Source of the tokens.  Only needed when
+            previous_tokens is empty.
 
-    def __init__(self, stream):
+        :return: A (tokens, first, old_stop, new_stop) tuple.  tokens is
+            previous_tokens, now the list of tokens of the edited source, in
+            which tokens[first:new_stop] are new and replace the previous
+            tokens[first:old_stop].  New tokens are spans over the source.
+
+        Raises ValueError if the edited source cannot be tokenized.  The source
+        is edited nonetheless.
+        '''
+        # pylint: disable=too-many-arguments
+        if src is None:
+            if not previous_tokens:
+                raise ValueError('no source to edit')
+            src = previous_tokens[0].source
+        if not isinstance(src, source.Source):
+            raise ValueError(src, 'is not a source.Source')
+
+        # The tokens ending before the edit were emitted before the lexer could
+        # see any edited character, so they are unaffected.
+        first = bisect.bisect_left(_TokenEnds(previous_tokens), edit_start)
+        restart = previous_tokens[first - 1].span[1] if first else 0
+        # The tokens starting in the edit are gone whatever happens.
+        size = len(previous_tokens)
+        old_stop = first
+        while old_stop < size and previous_tokens[old_stop].offset < edit_end:
+            old_stop += 1
+
+        src.replace(edit_start, edit_end, new_text)
+        # Once a new token is emitted where an old token after the edit started,
+        # the lexer is back in its start state on unchanged text, and all the
+        # following tokens are the old ones, already at their new offsets.
+        anchor = src.anchor
+        tokens = []
+        for clazz, start, end in _scan(src.buffer, restart):
+            while old_stop < size and previous_tokens[old_stop].offset < start:
+                old_stop += 1
+            if old_stop < size:
+                old = previous_tokens[old_stop]
+                if old.__class__ is clazz and old.span == (start, end):
+                    break
+            stored = anchor(start)
+            tokens.append(clazz(None, src, stored, stored + end - start))
+        else:
+            old_stop = size
+
+        previous_tokens[first:old_stop] = tokens
+        if src.piece_count > MAX_PIECES:
+            tok.settle(previous_tokens, src)
+            src.flatten()
+        return previous_tokens, first, old_stop, first + len(tokens)
+
+    def __init__(self, stream, *, locations=True, intern_table=None):
+        '''Create a Tokenizer.
+
+        Use it as a context manager to close its stream on exit, rather than
+        when the tokenizer is garbage collected.
+
+        :param stream: The char_stream.CharStream to read from.
+        :param locations: If True, tokens know their offset, line and column in
+            the source.  Otherwise, tokens carry no location, which lets all
+            parentheses share one tok.Bra and one tok.Ket instance.
+        :param intern_table: If not None, an interning.InternTable the text
+            and the value of the tokens are interned in.  It is kept by
+            reset().
+        '''
         assert isinstance(stream, char_stream.CharStream)
         self._stream = stream
+        self._locations = locations
+        self._intern_table = intern_table
+        self._reset_state()
+
+    def _reset_state(self):
+        '''Put the state machine back to its initial state.
+
+        This is an internal method and MUST NOT be used publicly.
+        '''
         self._state = _State.Start
-        self._orig_text = ''
+        # The pieces of the text of the current token, joined once by _emit()
+        # so that a long token is built in linear time.
+        self._pieces = []
+        self._start = 0
 
         # Variables used in the state machine.
         self.__open_block_length = 0
         self.__close_block_length = 0
 
+    def reset(self, stream):
+        '''Close the current source and start tokenizing another one.
+
+        The tokenizer and its char_stream.CharStream are reused, so a process
+        tokenizing many files can keep a single tokenizer.  An iteration in
+        progress over the previous source must not be resumed.
+
+        :param stream: A readable text stream, e.g., a file opened with
+            open(filename, 'r') or an io.StringIO.  It is closed by the next
+            reset() or close().
+        '''
+        self._stream.reset(stream)
+        self._reset_state()
+
+    def close(self):
+        '''Close the stream.  Closing more than once has no effect.
+        '''
+        self._stream.close()
+
+    @property
+    def closed(self):
+        '''Whether the stream is closed.
+        '''
+        return self._stream.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_args):
+        self.close()
+
     def __del__(self):
         self._stream.close()
 
@@ -100,15 +383,29 @@ class Tokenizer(object):
         '''
         curr = self._stream.curr()
         if not curr is None:
-            self._orig_text += self._stream.curr()
+            self._pieces.append(curr)
             if to_next:
                 next(self._stream)
 
+    def _push_until(self, chars):
+        '''Push characters into the symbol up to any one of chars.
+
+        Consumes the run of characters with a single bulk read from the input
+        stream instead of one _push() per character.
+
+        This is an internal method and MUST NOT be used publicly.
+        '''
+        self._pieces.append(self._stream.read_until(chars))
+
     def _error(self):
         '''Report tokenizing error.
         '''
         curr = self._stream.curr()
-        raise ValueError(self._orig_text, 'cannot parse', curr)
+        line, column = self._stream.line_index.position(self._stream.offset)
+        raise ValueError(
+            ''.join(self._pieces), 'cannot parse', curr,
+            'at line %d column %d' % (line, column)
+        )
 
     def _next(self):
         '''Move the input stream forward by one character.
@@ -131,27 +428,72 @@ class Tokenizer(object):
         This is an internal method and MUST NOT be used publicly.
         '''
         assert issubclass(clazz, tok.Token)
-        retval = clazz(self._orig_text)
-        self._orig_text = ''
-        return retval
+        text = ''.join(self._pieces)
+        self._pieces.clear()
+        if self._intern_table is not None:
+            text = self._intern_table.intern(text)
+        if self._locations:
+            token = clazz(
+                text, self._stream.line_index, self._start,
+                self._start + len(text)
+            )
+        else:
+            token = clazz(text)
+        if self._intern_table is not None \
+                and issubclass(clazz, tok.EscapedArgument):
+            token.intern_value(self._intern_table)
+        return token
 
-    def __iter__(self):
-        while not self._stream.is_eof():
-            result = self._iterate()
+    def _next_token(self):
+        '''Run the state machine until it emits a token.
+
+        This is an internal method and MUST NOT be used publicly.
+
+        :return: The token, or None once the input is exhausted.
+        '''
+        iterate = self._iterate
+        is_eof = self._stream.is_eof
+        while not is_eof():
+            result = iterate()
             if result:
-                yield result
-        result = self._iterate()
-        if result:
+                return result
+        return iterate()
+
+    def iter_batches(self, size):
+        '''Generate the tokens in lists of up to size tokens.
+
+        Consumers handling tokens in bulk, e.g., sending them to another
+        process, pay the cost of a generator step once per batch instead of
+        once per token.  All lists but the last one have size tokens.  A
+        tokenizing error is raised in place of the batch it occurs in.
+        '''
+        if size < 1:
+            raise ValueError(size, 'is not a positive batch size')
+        next_token = self._next_token
+        batch = []
+        append = batch.append
+        while True:
+            result = next_token()
+            if not result:
+                break
+            append(result)
+            if len(batch) == size:
+                yield batch
+                batch = []
+                append = batch.append
+        if batch:
+            yield batch
+
+    def __iter__(self):
+        next_token = self._next_token
+        while True:
+            result = next_token()
+            if not result:
+                return
             yield result
 
     def __next__(self):
-        while not self._stream.is_eof():
-            result = self._iterate()
-            if result:
-                return result
-        result = self._iterate()
-        if result:
-            return result
+        return self._next_token()
 
     __REGEX__ = re.compile('[^A-Za-z0-9;]')
 
@@ -176,6 +518,7 @@ class Tokenizer(object):
             # [             ->  BracketArgumentOpen
             # "             ->  QuotedArgument
             #
+            self._start = self._stream.offset
             if curr == '#':
                 self._push()
                 self._state = _State.Comment
@@ -226,8 +569,7 @@ class Tokenizer(object):
                 self._state = _State.Start
                 return self._emit(tok.Comment)
             else:
-                self._push()
-                self._state = _State.CommentLine
+                self._push_until('\n')
         elif self._state == _State.CommentBracketOpen:
             # Existing: #\[=*
             # =             ->  increment __open_block_length
@@ -264,12 +606,13 @@ class Tokenizer(object):
                 self._state = _State.Start
                 return self._emit(tok.Comment)
             else:
-                self._push()
+                self._push_until(']\n')
         elif self._state == _State.CommentBracketClose:
             # Existing: #\[={len}[.*\]=*
             # =             ->  increment __close_block_length
             # ] (same len)  ->  Start
             #                   _emit Comment
+            # ] (other len) ->  reset __close_block_length
             # \n EOF        ->  Start
             #                   _emit Comment
             # other         ->  CommentBracketContent
@@ -281,6 +624,9 @@ class Tokenizer(object):
                 self._push()
                 self._state = _State.Start
                 return self._emit(tok.Comment)
+            elif curr == ']':
+                self._push()
+                self.__close_block_length = 0
             elif curr == '\n' or curr is None:
                 self._next()
                 self._state = _State.Start
@@ -302,23 +648,22 @@ class Tokenizer(object):
             else:
                 self._error()
         elif self._state == _State.BracketArgumentContent:
-            # Existing: \[={len}\].*
-            # ]             ->  BracketArgumentContent
-            # other         ->  append to _orig_text
-            if curr == '=':
-                self._push()
-                self.__open_block_length += 1
-            elif curr == ']':
+            # Existing: \[={len}\[.*
+            # ]             ->  BracketArgumentClose
+            #                   reset __close_block_length
+            # other         ->  append to the text
+            if curr == ']':
                 self._push()
                 self.__close_block_length = 0
                 self._state = _State.BracketArgumentClose
             else:
-                self._push()
+                self._push_until(']')
         elif self._state == _State.BracketArgumentClose:
             # Existing: \[={len}\].*\[=*
             # =             ->  increment __close_block_length
             # ] (same len)  ->  Start
             #                   _emit BracketArgument
+            # ] (other len) ->  reset __close_block_length
             # other         ->  BracketArgumentContent
             if curr == '=':
                 self._push()
@@ -328,6 +673,9 @@ class Tokenizer(object):
                 self._push()
                 self._state = _State.Start
                 return self._emit(tok.BracketArgument)
+            elif curr == ']':
+                self._push()
+                self.__close_block_length = 0
             else:
                 self._push()
                 self._state = _State.BracketArgumentContent
@@ -345,14 +693,17 @@ class Tokenizer(object):
                 self._state = _State.Start
                 return self._emit(tok.QuotedArgument)
             else:
-                self._push()
+                self._push_until('\\"')
         elif self._state == _State.QuotedArgumentBackslash:
             # Existing: ".*\\
             # \n            ->  QuotedArgument
             # t r n ;       ->  QuotedArgument
             # A-Za-z0-9;    ->  QuotedArgument
+            # EOF           ->  Error
             # other         ->  Error
-            if curr == '\n':
+            if curr is None:
+                self._error()
+            elif curr == '\n':
                 self._push()
                 self._state = _State.QuotedArgument
             elif curr in 'trn;':
@@ -377,7 +728,7 @@ class Tokenizer(object):
                 self._state = _State.Start
                 return self._emit(tok.UnquotedArgument)
             else:
-                self._push()
+                self._push_until(' \t\v\n\r()#"\\')
         elif self._state == _State.UnquotedArgumentEscape:
             # Existing: any chars except '()#"\' plus a trailing '\'
             # t r n ; ' '   ->  UnquotedArgument
@@ -387,3 +738,452 @@ class Tokenizer(object):
                 self._state = _State.UnquotedArgument
             else:
                 self._error()
+
+
+class _TokenEnds(object):
+    '''The end offsets of a list of tokens, as a sequence bisect can search.
+
+    This is an internal class and MUST NOT be used publicly.
+    '''
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __getitem__(self, index):
+        return self._tokens[index].span[1]
+
+
+class _Syntax(object):
+    '''Compiled regexes and special characters of the cmake syntax.
+
+    There is one instance for str buffers and one for bytes-like buffers.  All
+    special characters are ASCII, so the same rules apply to both.
+
+    This is an internal class and MUST NOT be used publicly.
+    '''
+
+    def __init__(self, literal, char):
+        '''Compile the syntax.
+
+        :param literal: Converts a str literal to the type of the buffer.
+        :param char: Converts a single character to the type of an item of the
+            buffer, i.e., str for str buffers and int for bytes-like ones.
+        '''
+        self.whitespace_regex = re.compile(literal(r'[ \t\v\n\r]*'))
+        self.bracket_open_regex = re.compile(literal(r'\[(=*)\['))
+        self.bracket_open_prefix_regex = re.compile(literal(r'\[=*'))
+        self.quoted_argument_regex = re.compile(
+            literal(r'"(?:[^"\\]+|\\(?:[trn]|[^A-Za-z0-9]))*')
+        )
+        self.unquoted_argument_regex = re.compile(
+            literal(r'(?:[^ \t\v\n\r()#"\\]+|\\[trn; ])*')
+        )
+        self.bracket_close = literal(']')
+        self.newline = literal('\n')
+        self.bra = char('(')
+        self.ket = char(')')
+        self.hash = char('#')
+        self.bracket = char('[')
+        self.quote = char('"')
+        self.backslash = char('\\')
+
+
+_STR_SYNTAX = _Syntax(str, str)
+_BYTES_SYNTAX = _Syntax(str.encode, ord)
+
+
+def _finder(buffer):
+    '''Get the find(sub, start, end) method of the buffer.
+
+    memoryview has no find() method, so a regex search is used instead.
+    '''
+    find = getattr(buffer, 'find', None)
+    if find is not None:
+        return find
+
+    def find_in_memoryview(sub, start, end=len(buffer)):
+        match = re.compile(re.escape(sub)).search(buffer, start, end)
+        return match.start() if match else -1
+
+    return find_in_memoryview
+
+
+def _scan_error(buffer, start, stop, line_index=None, base=0):
+    '''Report a tokenizing error the same way Tokenizer._error() does.
+
+    :param start: Offset of the first character of the offending token.
+    :param stop: Offset of the character that cannot be parsed.
+    :param line_index: The source.LineIndex of the whole source if buffer is
+        only a part of it, starting at offset base.
+    '''
+    text = buffer[start:stop]
+    curr = buffer[stop:stop + 1]
+    if not isinstance(text, str):
+        # The offending character may be encoded in up to 4 bytes.
+        text = bytes(text).decode(errors='replace')
+        curr = bytes(buffer[stop:stop + 4]).decode(errors='replace')[:1]
+    if line_index is None:
+        line_index = source.LineIndex.from_buffer(buffer)
+    line, column = line_index.position(base + stop)
+    raise ValueError(
+        text, 'cannot parse', curr or None,
+        'at line %d column %d' % (line, column)
+    )
+
+
+def _incomplete(buffer, pos):
+    '''Check whether the buffer ends before the end of the character at pos.
+
+    A bytes-like buffer may end in the middle of the UTF-8 encoding of a
+    character, which more input completes.
+
+    This is an internal function and MUST NOT be used publicly.
+    '''
+    size = len(buffer)
+    if pos >= size:
+        return True
+    if isinstance(buffer, str):
+        return False
+    lead = buffer[pos]
+    if lead < 0xc0:
+        return False
+    length = 4 if lead >= 0xf0 else 3 if lead >= 0xe0 else 2
+    return pos + length > size
+
+
+def _scan(buffer, pos=0, *, final=True, line_index=None, base=0):
+    '''Scan the buffer from pos and generate (clazz, start, end) tuples.
+
+    pos must be the offset of the end of a token or 0.
+
+    If final is False, the buffer is only the beginning of the rest of the
+    input, and scanning stops before the first token that more input could
+    extend or complete.  Scanning can then resume from the end of the last
+    token generated, once more input is appended to the buffer.  line_index and
+    base are passed to _scan_error() for such partial buffers.
+
+    The rules are the same as the ones implemented by Tokenizer._iterate(),
+    including its handling of the end of the input: a bracket comment is closed
+    by a newline, and an argument that is still open when the input runs out is
+    dropped.
+
+    This is an internal function and MUST NOT be used publicly.
+    '''
+    # pylint: disable=too-many-branches
+    # pylint: disable=too-many-locals
+    # pylint: disable=too-many-statements
+    syntax = _STR_SYNTAX if isinstance(buffer, str) else _BYTES_SYNTAX
+    whitespace_match = syntax.whitespace_regex.match
+    bracket_open_match = syntax.bracket_open_regex.match
+    quoted_argument_match = syntax.quoted_argument_regex.match
+    unquoted_argument_match = syntax.unquoted_argument_regex.match
+    find = _finder(buffer)
+    size = len(buffer)
+    while True:
+        pos = whitespace_match(buffer, pos).end()
+        if pos >= size:
+            return
+        char = buffer[pos]
+        if char == syntax.bra:
+            yield tok.Bra, pos, pos + 1
+            pos += 1
+        elif char == syntax.ket:
+            yield tok.Ket, pos, pos + 1
+            pos += 1
+        elif char == syntax.hash:
+            match = bracket_open_match(buffer, pos + 1)
+            newline = find(syntax.newline, pos)
+            if newline == -1:
+                newline = size
+            if match:
+                close = syntax.bracket_close + match.group(1) \
+                        + syntax.bracket_close
+                stop = find(close, match.end(), newline)
+                stop = newline if stop == -1 else stop + len(close)
+            else:
+                stop = newline
+            if stop == size and not final:
+                return
+            yield tok.Comment, pos, stop
+            pos = stop
+        elif char == syntax.bracket:
+            match = bracket_open_match(buffer, pos)
+            if not match:
+                prefix = syntax.bracket_open_prefix_regex.match(buffer, pos)
+                if not final and _incomplete(buffer, prefix.end()):
+                    return
+                _scan_error(buffer, pos, prefix.end(), line_index, base)
+            close = syntax.bracket_close + match.group(1) \
+                    + syntax.bracket_close
+            stop = find(close, match.end())
+            if stop == -1:
+                return
+            stop += len(close)
+            yield tok.BracketArgument, pos, stop
+            pos = stop
+        elif char == syntax.quote:
+            stop = quoted_argument_match(buffer, pos).end()
+            if stop >= size:
+                return
+            if buffer[stop] != syntax.quote:
+                # A backslash followed by an invalid escape sequence, or by
+                # nothing yet.
+                if not final and _incomplete(buffer, stop + 1):
+                    return
+                _scan_error(buffer, pos, stop + 1, line_index, base)
+            stop += 1
+            yield tok.QuotedArgument, pos, stop
+            pos = stop
+        else:
+            stop = unquoted_argument_match(buffer, pos).end()
+            if stop >= size:
+                return
+            if buffer[stop] == syntax.backslash:
+                if not final and _incomplete(buffer, stop + 1):
+                    return
+                _scan_error(buffer, pos, stop + 1, line_index, base)
+            yield tok.UnquotedArgument, pos, stop
+            pos = stop
+
+
+def iter_spans(buffer):
+    '''Generate the (kind, start, end) span of every token in the buffer.
+
+    Nothing but the span tuple is allocated per token, which makes this the
+    cheapest way to walk the tokens of a large source.  Use
+    tokenize_to_table() to keep them.
+
+    :param buffer: A str, or a bytes-like object such as bytes, memoryview or
+        mmap.mmap, in which case the offsets are byte offsets.
+
+    :return: A generator of (tok.Kind, int, int) tuples.
+    '''
+    for clazz, start, end in _scan(buffer):
+        yield clazz.KIND, start, end
+
+
+def tokenize_to_table(buffer, *, encoding='utf-8', errors='strict'):
+    '''Tokenize a whole buffer into a token_table.TokenTable.
+
+    No token object is created.  Only the kind and offsets of each token are
+    stored in the arrays of the table.
+
+    :param buffer: A str, or a bytes-like object such as bytes, memoryview or
+        mmap.mmap, in which case the offsets are byte offsets.
+    :param encoding: Encoding used to decode the text of a token from a
+        bytes-like buffer.
+    :param errors: The error handler used to decode that text.
+    '''
+    table = token_table.TokenTable(
+        source.Source(buffer, encoding=encoding, errors=errors)
+    )
+    append_kind = table.kinds.append
+    append_start = table.starts.append
+    append_end = table.ends.append
+    for clazz, start, end in _scan(buffer):
+        append_kind(clazz.KIND)
+        append_start(start)
+        append_end(end)
+    return table
+
+
+class RegexTokenizer(object):
+    '''Tokenize a cmake source held in memory using compiled regexes.
+
+    Produces exactly the same tokens as Tokenizer, but instead of walking the
+    state machine one character at a time, it matches a whole token with a
+    single regex and finds the closing bracket of bracket arguments and bracket
+    comments with str.find().
+
+    Use Tokenizer.from_string(), Tokenizer.from_file() with engine='regex', or
+    Tokenizer.from_buffer() to create one.  Like Tokenizer, it can be used as a
+    context manager and reset() to tokenize another source.
+    '''
+
+    def __init__(
+        self,
+        buffer,
+        *,
+        spans=False,
+        locations=True,
+        encoding='utf-8',
+        errors='strict',
+        intern_table=None,
+        closing=False
+    ):
+        '''Create a RegexTokenizer.
+
+        :param buffer: A str or a bytes-like object.
+        :param spans: If True, tokens refer to a single source.Source by
+            offsets instead of owning their text.  Such tokens always know
+            their location.
+        :param locations: If True, tokens owning their text also know their
+            offset, line and column.
+        :param encoding: Encoding of a bytes-like buffer.
+        :param errors: The error handler used to decode a bytes-like buffer.
+        :param intern_table: If not None, an interning.InternTable the text
+            and the value of tokens owning their text are interned in.  It is
+            kept by reset().
+        :param closing: If True, the buffer, e.g., a memory map of a file, is
+            owned by the tokenizer and closed by close() and reset().
+        '''
+        # pylint: disable=too-many-arguments
+        self._encoding = encoding
+        self._errors = errors
+        self._intern_table = intern_table
+        if spans:
+            self._make = self._make_span
+        elif locations:
+            self._make = self._make_located_token
+        else:
+            self._make = self._make_token
+        if intern_table is not None and not spans:
+            self._make_owning = self._make
+            self._make = self._make_interned_token
+        self._start(buffer, closing)
+
+    @classmethod
+    def from_table(
+        cls,
+        table,
+        *,
+        spans=False,
+        locations=True,
+        intern_table=None,
+        closing=False
+    ):
+        '''Create a RegexTokenizer over the tokens of a token_table.TokenTable.
+
+        The source is not lexed again.  The arguments are as for __init__(),
+        with the buffer, encoding and errors of the source of the table.
+        '''
+        # pylint: disable=too-many-arguments
+        src = table.source
+        tokenizer = cls(
+            src.buffer,
+            spans=spans,
+            locations=locations,
+            encoding=src.encoding,
+            errors=src.errors,
+            intern_table=intern_table,
+            closing=closing
+        )
+        # pylint: disable=protected-access
+        tokenizer._spans = zip(
+            map(tok.CLASSES.__getitem__, table.kinds), table.starts, table.ends
+        )
+        return tokenizer
+
+    def _start(self, buffer, closing):
+        '''Start tokenizing a buffer.
+
+        This is an internal method and MUST NOT be used publicly.
+        '''
+        self._source = source.Source(
+            buffer, encoding=self._encoding, errors=self._errors
+        )
+        self._text = self._source.text
+        if self._intern_table is not None:
+            self._text = self._interned_text
+        self._spans = _scan(buffer)
+        self._closing = closing
+        self._closed = False
+
+    def reset(self, stream):
+        '''Close the current source and start tokenizing another one.
+
+        An iteration in progress over the previous source must not be resumed.
+
+        :param stream: A readable stream, e.g., a file opened with
+            open(filename, 'r') or an io.StringIO, which is read whole and
+            closed, or a str or bytes-like buffer.
+        '''
+        self.close()
+        if isinstance(stream, io.IOBase):
+            with stream:
+                stream = stream.read()
+        self._start(stream, False)
+
+    def close(self):
+        '''Close the buffer if the tokenizer owns it, e.g., a memory map.
+
+        Tokens referring to a closed buffer can no longer read their text.
+        Closing more than once has no effect.
+        '''
+        self._spans = iter(())
+        self._closed = True
+        if self._closing:
+            self._closing = False
+            close = getattr(self._source.buffer, 'close', None)
+            if close is not None:
+                close()
+
+    @property
+    def closed(self):
+        '''Whether close() was called since the last reset().
+        '''
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_args):
+        self.close()
+
+    def _interned_text(self, start, end):
+        '''Get the text of a span from the intern table.
+        '''
+        return self._intern_table.intern(self._source.text(start, end))
+
+    def _make_token(self, clazz, start, end):
+        '''Create a token owning its text.
+        '''
+        return clazz(self._text(start, end))
+
+    def _make_located_token(self, clazz, start, end):
+        '''Create a token owning its text and knowing its location.
+        '''
+        return clazz(self._text(start, end), self._source, start, end)
+
+    def _make_interned_token(self, clazz, start, end):
+        '''Create a token owning its text whose value is interned too.
+        '''
+        token = self._make_owning(clazz, start, end)
+        if issubclass(clazz, tok.EscapedArgument):
+            token.intern_value(self._intern_table)
+        return token
+
+    def _make_span(self, clazz, start, end):
+        '''Create a token referring to the source by offsets.
+        '''
+        return clazz(None, self._source, start, end)
+
+    def __iter__(self):
+        make = self._make
+        for clazz, start, end in self._spans:
+            yield make(clazz, start, end)
+
+    def __next__(self):
+        for clazz, start, end in self._spans:
+            return self._make(clazz, start, end)
+
+    def iter_batches(self, size):
+        '''Generate the tokens in lists of up to size tokens.
+
+        See Tokenizer.iter_batches().
+        '''
+        if size < 1:
+            raise ValueError(size, 'is not a positive batch size')
+        make = self._make
+        spans = self._spans
+        while True:
+            batch = [
+                make(clazz, start, end)
+                for clazz, start, end in itertools.islice(spans, size)
+            ]
+            if not batch:
+                return
+            yield batch
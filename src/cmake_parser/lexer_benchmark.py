@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+'''Measure the throughput of the tokenizers.
+
+Tokenizes test_data/1-3.txt and a large input generated by the corpus module
+with each variant of the tokenizer, and reports MB/s, tokens/s, the peak memory
+allocated while tokenizing and how many tokens and bytes each token class
+accounts for.  Comparing the variants with and without locations shows the
+cost of tracking locations.
+
+The file variants tokenize the same inputs from files, decoding the whole file
+upfront (text), or lexing its raw bytes and decoding nothing (binary and
+memory_map).  The value variants also get the value of every argument, i.e.,
+decode only what a parser keeping arguments and dropping comments would.
+
+Results can be written as JSON with --output.  With --baseline, the results are
+compared with a previous JSON output, and the script exits with status 1 if the
+throughput of some measurement dropped by more than --threshold.
+'''
+
+import argparse
+import collections
+import json
+import pathlib
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import corpus
+import lexer
+import tok
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+INPUTS = ['1.txt', '2.txt', '3.txt']
+
+# Maps variant names to functions tokenizing a str.
+VARIANTS = collections.OrderedDict([
+    (
+        'state_machine',
+        lambda text: lexer.Tokenizer.from_string(text, engine='state_machine')
+    ),
+    (
+        'state_machine/no-locations', lambda text: lexer.Tokenizer.
+        from_string(text, engine='state_machine', locations=False)
+    ),
+    ('regex', lambda text: lexer.Tokenizer.from_string(text, engine='regex')),
+    (
+        'regex/no-locations', lambda text: lexer.Tokenizer.
+        from_string(text, engine='regex', locations=False)
+    ),
+    ('spans', lexer.Tokenizer.from_buffer),
+    ('table', lexer.tokenize_to_table),
+])
+
+# Maps variant names to functions tokenizing a file.
+FILE_VARIANTS = collections.OrderedDict([
+    ('file/text', lambda path: lexer.Tokenizer.from_file(path, engine='regex')),
+    ('file/binary', lambda path: lexer.Tokenizer.from_file(path, binary=True)),
+    (
+        'file/memory_map',
+        lambda path: lexer.Tokenizer.from_file(path, memory_map=True)
+    ),
+    (
+        'file/text/values',
+        lambda path: _values(lexer.Tokenizer.from_file(path, engine='regex'))
+    ),
+    (
+        'file/binary/values',
+        lambda path: _values(lexer.Tokenizer.from_file(path, binary=True))
+    ),
+])
+
+
+def _values(tokens):
+    '''Generate the value of every argument of tokens.
+    '''
+    for token in tokens:
+        if isinstance(token, tok.Argument):
+            yield token.value
+
+
+def consume(tokens):
+    '''Iterate over tokens and drop them.
+    '''
+    collections.deque(tokens, maxlen=0)
+
+
+def _tokenizer(variant):
+    '''Get the function of a variant.
+    '''
+    if variant in FILE_VARIANTS:
+        return FILE_VARIANTS[variant]
+    return VARIANTS[variant]
+
+
+def best_time(data, variant, repeat):
+    '''Get the best time of tokenizing data, a str or the path of a file.
+    '''
+    tokenize = _tokenizer(variant)
+    return min(
+        timeit.repeat(lambda: consume(tokenize(data)), number=1, repeat=repeat)
+    )
+
+
+def peak_memory(data, variant):
+    '''Get the peak memory allocated while tokenizing data, in bytes.
+    '''
+    tokenize = _tokenizer(variant)
+    tracemalloc.start()
+    try:
+        consume(tokenize(data))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def breakdown(text):
+    '''Count the tokens and bytes of each token class of text.
+
+    :return: A (number of tokens, {class name: {count, bytes}}) tuple.
+    '''
+    classes = collections.OrderedDict((kind.name, {
+        'count': 0,
+        'bytes': 0
+    }) for kind in tok.Kind)
+    total = 0
+    for kind, start, end in lexer.iter_spans(text):
+        entry = classes[tok.Kind(kind).name]
+        entry['count'] += 1
+        entry['bytes'] += end - start
+        total += 1
+    return total, classes
+
+
+def measure(name, path, variants, repeat):
+    '''Measure each variant on the UTF-8 file at path.
+
+    :return: A list of result dicts.
+    '''
+    with open(str(path), 'r') as f:
+        text = f.read()
+    size = len(text.encode())
+    count, classes = breakdown(text)
+    results = []
+    for variant in variants:
+        data = str(path) if variant in FILE_VARIANTS else text
+        seconds = best_time(data, variant, repeat)
+        results.append(
+            collections.OrderedDict([
+                ('input', name),
+                ('variant', variant),
+                ('bytes', size),
+                ('tokens', count),
+                ('seconds', seconds),
+                ('mb_per_s', size / seconds / 1e6),
+                ('tokens_per_s', count / seconds),
+                ('peak_memory', peak_memory(data, variant)),
+                ('classes', classes),
+            ])
+        )
+    return results
+
+
+def compare(results, baseline, threshold):
+    '''Compare results with baseline results.
+
+    :return: The list of messages about measurements whose throughput dropped
+        by more than threshold.
+    '''
+    previous = {(result['input'], result['variant']): result['mb_per_s']
+                for result in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['input'], result['variant'])
+        if key not in previous:
+            continue
+        ratio = result['mb_per_s'] / previous[key]
+        if ratio < 1 - threshold:
+            regressions.append(
+                '%s %s: %.2f MB/s, was %.2f MB/s (%+.1f%%)' % (
+                    key[0], key[1], result['mb_per_s'], previous[key],
+                    (ratio - 1) * 100
+                )
+            )
+    return regressions
+
+
+def print_results(results):
+    '''Print results as a table, followed by the per class breakdowns.
+    '''
+    print(
+        '%-10s %-26s %9s %12s %10s' %
+        ('input', 'variant', 'MB/s', 'tokens/s', 'peak MB')
+    )
+    for result in results:
+        print(
+            '%-10s %-26s %9.2f %12.0f %10.2f' % (
+                result['input'], result['variant'], result['mb_per_s'],
+                result['tokens_per_s'], result['peak_memory'] / 1e6
+            )
+        )
+    printed = set()
+    for result in results:
+        if result['input'] in printed:
+            continue
+        printed.add(result['input'])
+        print()
+        print('%s: %d tokens' % (result['input'], result['tokens']))
+        for name, entry in result['classes'].items():
+            print(
+                '  %-18s %8d tokens %5.1f%% %10d bytes %5.1f%%' % (
+                    name, entry['count'],
+                    entry['count'] / max(1, result['tokens']) * 100,
+                    entry['bytes'], entry['bytes'] / result['bytes'] * 100
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--variant',
+        action='append',
+        choices=list(VARIANTS) + list(FILE_VARIANTS),
+        help='variant to measure, may be repeated (default: all)'
+    )
+    parser.add_argument(
+        '--size',
+        type=float,
+        default=2,
+        help='size of the large input, in MB (default: 2)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5, help='number of timings to take'
+    )
+    parser.add_argument('--output', help='file to write the results to')
+    parser.add_argument(
+        '--baseline', help='results of a previous run to compare with'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.1,
+        help='largest acceptable drop of throughput (default: 0.1)'
+    )
+    args = parser.parse_args()
+    variants = args.variant or list(VARIANTS) + list(FILE_VARIANTS)
+
+    results = []
+    for name in INPUTS:
+        results.extend(measure(name, DATA_DIR / name, variants, args.repeat))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'large.txt')
+        with open(path, 'w') as f:
+            f.write(corpus.generate(int(args.size * 1e6))[0])
+        results.extend(measure('large', path, variants, args.repeat))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(
+                collections.OrderedDict([
+                    ('python', platform.python_version()),
+                    ('size', args.size),
+                    ('results', results),
+                ]),
+                f,
+                indent=2
+            )
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print()
+            print('Throughput regressions:')
+            for message in regressions:
+                print('  ' + message)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
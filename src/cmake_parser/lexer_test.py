@@ -2,11 +2,15 @@
 # pylint: disable=invalid-name
 
 import glob
+import io
 import pathlib
+import tempfile
 import textwrap
+import time
 import unittest
 
 import lexer
+import source
 import tok
 
 THIS_DIR = pathlib.Path(__file__).resolve().parent
@@ -176,6 +180,431 @@ class TestTokenizer(unittest.TestCase):
                     expected = expected.rstrip('\n')
                     self.assertEqual(str(actual), expected, msg=src_path)
 
+    def test_bracket_close(self):
+        data = {
+            '[[a=b]] ': [
+                tok.BracketArgument('[[a=b]]'),
+            ],
+            '[=[a]]=] ': [
+                tok.BracketArgument('[=[a]]=]'),
+            ],
+            '#[=[a]]=] b ': [
+                tok.Comment('#[=[a]]=]'),
+                tok.UnquotedArgument('b'),
+            ],
+        }
+        for text, tokens in data.items():
+            g = lexer.Tokenizer.from_string(text)
+            self.assertEqual(list(g), tokens, msg=text)
+
+    def test_long_tokens(self):
+        # Tokens made of many short pieces are built in linear time: four
+        # times the text takes about four times as long, not sixteen.
+        data = {
+            tok.QuotedArgument: lambda size: '"' + '\\;' * (size // 2) + '"',
+            tok.BracketArgument: lambda size: '[=[' + ']' * size + ']=]',
+        }
+        for clazz, make in data.items():
+            seconds = []
+            for size in (1 << 17, 1 << 19):
+                text = 'a(' + make(size) + ')'
+                start = time.perf_counter()
+                tokens = list(
+                    lexer.Tokenizer.from_string(text, engine='state_machine')
+                )
+                seconds.append(time.perf_counter() - start)
+                self.assertEqual(tokens[2], clazz(text[2:-1]))
+            self.assertLess(seconds[1], 6 * seconds[0], msg=clazz)
+
+    def test_locations(self):
+        text = 'cmd(a\n  "b"\t#c\n[[d]])'
+        expected = [
+            (0, 3, 1, 1),
+            (3, 4, 1, 4),
+            (4, 5, 1, 5),
+            (8, 11, 2, 3),
+            (12, 14, 2, 7),
+            (15, 20, 3, 1),
+            (20, 21, 3, 6),
+        ]
+        tokenizers = [
+            lexer.Tokenizer.from_string(text),
+            lexer.Tokenizer.from_string(text, engine='regex'),
+            lexer.Tokenizer.from_buffer(text),
+        ]
+        for g in tokenizers:
+            actual = [token.span + (token.line, token.column) for token in g]
+            self.assertEqual(actual, expected)
+
+    def test_no_locations(self):
+        for engine in lexer.ENGINES:
+            tokens = list(
+                lexer.Tokenizer.from_string(
+                    'a(b)', engine=engine, locations=False
+                )
+            )
+            self.assertEqual([token.span for token in tokens], [None] * 4)
+            self.assertIs(tokens[1], tok.Bra('('))
+
+    def test_error_location(self):
+        for engine in lexer.ENGINES:
+            with self.assertRaises(ValueError) as context:
+                list(lexer.Tokenizer.from_string('a\n  b\\x', engine=engine))
+            self.assertEqual(
+                context.exception.args,
+                ('b\\', 'cannot parse', 'x', 'at line 2 column 5')
+            )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            lexer.Tokenizer.from_string('foo', engine='bogus')
+
+    def test_context_manager(self):
+        src_path = str(DATA_DIR / '1.txt')
+        with lexer.Tokenizer.from_file(src_path) as g:
+            self.assertFalse(g.closed)
+            tokens = list(g)
+        self.assertTrue(g.closed)
+        self.assertEqual(tokens, list(lexer.Tokenizer.from_file(src_path)))
+        for engine in lexer.ENGINES:
+            with lexer.Tokenizer.from_file(src_path, engine=engine) as g:
+                self.assertEqual(list(g), tokens)
+            self.assertTrue(g.closed)
+
+    def test_close_memory_map(self):
+        src_path = str(DATA_DIR / '1.txt')
+        expected = list(lexer.Tokenizer.from_file(src_path))
+        with lexer.Tokenizer.from_file(src_path, memory_map=True) as g:
+            tokens = list(g)
+            self.assertEqual(tokens, expected)
+            buffer = tokens[0].source.buffer
+        self.assertTrue(buffer.closed)
+        self.assertEqual([token.span for token in tokens], [
+            token.span
+            for token in lexer.Tokenizer.from_file(src_path, binary=True)
+        ])
+        with self.assertRaises(ValueError):
+            tokens[0].orig_text  # pylint: disable=pointless-statement
+
+        # A memory map the tokenizer was given is left open.
+        buffer = lexer.map_file(src_path)
+        with lexer.Tokenizer.from_buffer(buffer) as g:
+            self.assertEqual(list(g), expected)
+        self.assertFalse(buffer.closed)
+        buffer.close()
+
+    def test_reset(self):
+        paths = sorted(glob.glob(str(DATA_DIR / '*.txt')))
+        with lexer.Tokenizer.from_string('set(a "b') as g:
+            # Leave the state machine in the middle of a token.
+            self.assertEqual(next(g), tok.UnquotedArgument('set'))
+            self.assertEqual(next(g), tok.Bra('('))
+            self.assertEqual(next(g), tok.UnquotedArgument('a'))
+            files = []
+            for src_path in paths:
+                files.append(open(src_path, 'r'))
+                g.reset(files[-1])
+                tokens = list(g)
+                expected = list(lexer.Tokenizer.from_file(src_path))
+                self.assertEqual(tokens, expected, msg=src_path)
+                self.assertEqual([(token.line, token.column)
+                                  for token in tokens],
+                                 [(token.line, token.column)
+                                  for token in expected],
+                                 msg=src_path)
+            g.reset(io.StringIO('a(b)'))
+            self.assertEqual(len(list(g)), 4)
+        for f in files:
+            self.assertTrue(f.closed)
+
+        src_path = str(DATA_DIR / '1.txt')
+        with lexer.Tokenizer.from_file(src_path, memory_map=True) as g:
+            buffer = next(g).source.buffer
+            g.reset('a(b)')
+            self.assertTrue(buffer.closed)
+            self.assertEqual(len(list(g)), 4)
+            g.reset(b'c\n')
+            self.assertEqual(list(g), [tok.UnquotedArgument('c')])
+
+    def test_iter_batches(self):
+        with open(str(DATA_DIR / '3.txt'), 'r') as f:
+            text = f.read()
+        expected = list(lexer.Tokenizer.from_string(text))
+        for engine in lexer.ENGINES:
+            for size in (1, 7, len(expected), len(expected) + 1):
+                g = lexer.Tokenizer.from_string(text, engine=engine)
+                batches = list(g.iter_batches(size))
+                for batch in batches[:-1]:
+                    self.assertEqual(len(batch), size)
+                self.assertEqual([
+                    token for batch in batches for token in batch
+                ], expected)
+            with self.assertRaises(ValueError):
+                g = lexer.Tokenizer.from_string(text, engine=engine)
+                list(g.iter_batches(0))
+        self.assertEqual(
+            list(lexer.Tokenizer.from_string('').iter_batches(4)), []
+        )
+
+    def test_iter_batches_error(self):
+        batches = lexer.Tokenizer.from_string('a b c d\\q').iter_batches(2)
+        self.assertEqual(
+            next(batches),
+            [tok.UnquotedArgument('a'),
+             tok.UnquotedArgument('b')]
+        )
+        with self.assertRaises(ValueError):
+            next(batches)
+
+    def test_next(self):
+        g = lexer.Tokenizer.from_string('foo(')
+        self.assertEqual(next(g), tok.UnquotedArgument('foo'))
+        self.assertEqual(next(g), tok.Bra('('))
+        self.assertIsNone(next(g))
+
+
+class TestRegexTokenizer(unittest.TestCase):
+
+    def assertSameTokens(self, text):
+        expected = list(lexer.Tokenizer.from_string(text))
+        actual = list(lexer.Tokenizer.from_string(text, engine='regex'))
+        self.assertEqual(actual, expected, msg=text)
+
+    def test_snippets(self):
+        data = [
+            '# one-line comment\n# another one',
+            '#[[ bracket comment ]]#[=[a]=] #[==[a\n#a',
+            '#[=x\n#[\n#',
+            '[=[\nfoo ]] ]==] bar\n]=]',
+            '"foo""bar" "\\"" "foo\\\n bar" "\\;\\ "',
+            'foo;bar; foo\\;bar foo\\ bar foo[[bar]] trailing',
+            'cmd(a (b) "c")\r\n\v\tcmd2 (x)#comment',
+        ]
+        for text in data:
+            self.assertSameTokens(text)
+
+    def test_errors(self):
+        data = [
+            '[=x',
+            '[',
+            '"foo\\x"',
+            '"foo\\',
+            'foo\\x',
+            'foo\\',
+            '\\x',
+        ]
+        for text in data:
+            with self.assertRaises(ValueError) as expected:
+                list(lexer.Tokenizer.from_string(text))
+            with self.assertRaises(ValueError) as actual:
+                list(lexer.Tokenizer.from_string(text, engine='regex'))
+            self.assertEqual(
+                actual.exception.args, expected.exception.args, msg=text
+            )
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            expected = list(lexer.Tokenizer.from_file(src_path))
+            actual = list(lexer.Tokenizer.from_file(src_path, engine='regex'))
+            self.assertEqual(actual, expected, msg=src_path)
+
+    def test_from_buffer(self):
+        text = 'cmd(\u00e9 "\u00e9" [[\u00e9]]) # \u00e9\n'
+        expected = list(lexer.Tokenizer.from_string(text))
+        for buffer in [text, text.encode(), memoryview(text.encode())]:
+            actual = list(lexer.Tokenizer.from_buffer(buffer))
+            self.assertEqual(actual, expected, msg=buffer)
+            src = source.Source(buffer)
+            for token in actual:
+                self.assertEqual(token.orig_text, src.text(*token.span))
+
+    def test_iter_spans(self):
+        text = 'cmd(\u00e9 #c\n)'
+        self.assertEqual(
+            list(lexer.iter_spans(text)), [
+                (tok.Kind.UnquotedArgument, 0, 3),
+                (tok.Kind.Bra, 3, 4),
+                (tok.Kind.UnquotedArgument, 4, 5),
+                (tok.Kind.Comment, 6, 8),
+                (tok.Kind.Ket, 9, 10),
+            ]
+        )
+        self.assertEqual(
+            list(lexer.iter_spans(text.encode()))[2:], [
+                (tok.Kind.UnquotedArgument, 4, 6),
+                (tok.Kind.Comment, 7, 9),
+                (tok.Kind.Ket, 10, 11),
+            ]
+        )
+
+    def test_memory_map(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            expected = list(lexer.Tokenizer.from_file(src_path))
+            actual = list(lexer.Tokenizer.from_file(src_path, memory_map=True))
+            self.assertEqual(actual, expected, msg=src_path)
+            self.assertEqual([token.span for token in actual[:3]],
+                             [token.span for token in expected[:3]],
+                             msg=src_path)
+
+    def test_binary(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            expected = list(lexer.Tokenizer.from_file(src_path))
+            actual = list(lexer.Tokenizer.from_file(src_path, binary=True))
+            self.assertEqual(actual, expected, msg=src_path)
+            self.assertEqual([token.span for token in actual[:3]],
+                             [token.span for token in expected[:3]],
+                             msg=src_path)
+
+    def test_binary_broken_encoding(self):
+        with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+            f.write(b'# caf\xe9\nset(a "\xc3\xa9")\n')
+            f.flush()
+            with self.assertRaises(UnicodeDecodeError):
+                list(lexer.Tokenizer.from_file(f.name))
+            tokens = list(lexer.Tokenizer.from_file(f.name, binary=True))
+            self.assertEqual([type(token) for token in tokens], [
+                tok.Comment, tok.UnquotedArgument, tok.Bra,
+                tok.UnquotedArgument, tok.QuotedArgument, tok.Ket
+            ])
+            self.assertEqual(tokens[4].value, 'é')
+            self.assertEqual(tokens[4].span, (13, 17))
+            with self.assertRaises(UnicodeDecodeError):
+                tokens[0].value  # pylint: disable=pointless-statement
+            tokens = list(
+                lexer.Tokenizer.from_file(
+                    f.name, memory_map=True, errors='replace'
+                )
+            )
+            self.assertEqual(tokens[0].value, '# caf\ufffd')
+            tokens = list(lexer.Tokenizer.from_file(f.name, errors='replace'))
+            self.assertEqual(tokens[0].value, '# caf\ufffd')
+
+    def test_memory_map_empty_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+            g = lexer.Tokenizer.from_file(f.name, memory_map=True)
+            self.assertEqual(list(g), [])
+
+    def test_tokenize_to_table(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'r') as f:
+                text = f.read()
+            table = lexer.tokenize_to_table(text)
+            expected = list(lexer.Tokenizer.from_string(text))
+            self.assertEqual(list(table), expected, msg=src_path)
+            self.assertEqual(
+                table.count(tok.Kind.Bra),
+                sum(isinstance(token, tok.Bra) for token in expected)
+            )
+
+    def test_next(self):
+        g = lexer.Tokenizer.from_string('foo(', engine='regex')
+        self.assertEqual(next(g), tok.UnquotedArgument('foo'))
+        self.assertEqual(next(g), tok.Bra('('))
+        self.assertIsNone(next(g))
+
+
+class TestRelex(unittest.TestCase):
+
+    def _check(self, text, edit_start, edit_end, new_text):
+        previous = list(lexer.Tokenizer.from_buffer(text))
+        result = lexer.Tokenizer.relex(
+            list(previous), edit_start, edit_end, new_text
+        )
+        edited = text[:edit_start] + new_text + text[edit_end:]
+        tokens = result[0]
+        expected = list(lexer.Tokenizer.from_buffer(edited))
+        self.assertEqual(tokens, expected)
+        self.assertEqual([token.span for token in tokens],
+                         [token.span for token in expected])
+        return previous, result
+
+    def test_edit_inside_token(self):
+        text = 'set(foo bar)\nmessage(baz)\n'
+        previous, (tokens, first, old_stop,
+                   new_stop) = self._check(text, 5, 6, 'OO')
+        self.assertEqual((first, old_stop, new_stop), (2, 3, 3))
+        self.assertEqual(tokens[2], tok.UnquotedArgument('fOOo'))
+        self.assertIs(tokens[0], previous[0])
+        self.assertIs(tokens[-1], previous[-1])
+        self.assertEqual(tokens[-1].span, (25, 26))
+        self.assertEqual((tokens[-1].line, tokens[-1].column), (2, 12))
+
+    def test_edit_changes_following_tokens(self):
+        text = 'set(foo bar)\nmessage(baz"x")\n'
+        previous, (tokens, first, old_stop,
+                   new_stop) = self._check(text, 4, 4, '"')
+        self.assertEqual(
+            tokens[2], tok.QuotedArgument('"foo bar)\nmessage(baz"')
+        )
+        self.assertEqual(tokens[3:], [tok.UnquotedArgument('x')])
+        self.assertEqual((first, new_stop), (1, 4))
+        self.assertEqual(old_stop, len(previous))
+
+    def test_edits(self):
+        text = '#[[c]] a("b" [=[c]=]) # d\n e(f\\;g)\n'
+        for start in range(len(text) + 1):
+            for end in range(start, min(start + 3, len(text)) + 1):
+                for new_text in ('', 'x', ' ', '(', '"', '#', ']]'):
+                    edited = text[:start] + new_text + text[end:]
+                    try:
+                        list(lexer.Tokenizer.from_buffer(edited))
+                    except ValueError:
+                        continue
+                    self._check(text, start, end, new_text)
+
+    def test_many_edits(self):
+        edits = [(5, 5, 'x'), (6, 6, 'y'), (40, 42, ''), (0, 0, 'z(a)'),
+                 (60, 61, '  '), (3, 3, ' '), (90, 100, 'q'), (1, 1, '')]
+        max_pieces = lexer.MAX_PIECES
+        lexer.MAX_PIECES = 4
+        try:
+            for encode in (str, str.encode):
+                text = encode('set(foo bar)\n# c\nmessage("a b" [[c]])\n' * 4)
+                previous = list(lexer.Tokenizer.from_buffer(text))
+                tokens = previous
+                for edit_start, edit_end, new_text in edits * 3:
+                    new_text = encode(new_text)
+                    text = text[:edit_start] + new_text + text[edit_end:]
+                    tokens = lexer.Tokenizer.relex(
+                        tokens, edit_start, edit_end, new_text
+                    )[0]
+                    expected = list(lexer.Tokenizer.from_buffer(text))
+                    self.assertEqual(tokens, expected)
+                    self.assertEqual([token.span for token in tokens],
+                                     [token.span for token in expected])
+                self.assertIs(tokens, previous)
+                self.assertLessEqual(tokens[0].source.piece_count, 4)
+        finally:
+            lexer.MAX_PIECES = max_pieces
+
+    def test_bytes(self):
+        text = 'foo(\u00e9 bar)'.encode()
+        previous = list(lexer.Tokenizer.from_buffer(text))
+        tokens = lexer.Tokenizer.relex(previous, 4, 6, b'xx')[0]
+        self.assertEqual(
+            tokens, list(lexer.Tokenizer.from_buffer(b'foo(xx bar)'))
+        )
+        self.assertEqual(tokens[-1].span, (10, 11))
+
+    def test_empty(self):
+        src = source.Source('')
+        tokens, first, old_stop, new_stop = lexer.Tokenizer.relex([],
+                                                                  0,
+                                                                  0,
+                                                                  'a(b)',
+                                                                  src=src)
+        self.assertEqual(tokens, list(lexer.Tokenizer.from_buffer('a(b)')))
+        self.assertEqual((first, old_stop, new_stop), (0, 0, 4))
+        with self.assertRaises(ValueError):
+            lexer.Tokenizer.relex([], 0, 0, 'a')
+
+    def test_not_a_source(self):
+        previous = list(
+            lexer.Tokenizer.from_string('a(b)', engine='state_machine')
+        )
+        with self.assertRaises(ValueError):
+            lexer.Tokenizer.relex(previous, 0, 1, 'c')
+
 
 if __name__ == '__main__':
     unittest.main()
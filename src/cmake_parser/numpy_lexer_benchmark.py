@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+'''Compare numpy_lexer with the engines of lexer.
+
+Tokenizes a generated list of source files, one unquoted argument per line,
+a source generated by the corpus module with its default mix, and the given
+files, and reports the throughput of the state machine, of
+lexer.tokenize_to_table() and of numpy_lexer.tokenize_to_table(), with the
+speedup of each over the state machine.
+'''
+
+import argparse
+import collections
+import timeit
+
+import corpus
+import lexer
+import numpy_lexer
+
+# Maps engine names to functions tokenizing bytes.
+ENGINES = collections.OrderedDict([
+    (
+        'state_machine', lambda buffer: collections.
+        deque(lexer.Tokenizer.from_string(buffer.decode()), maxlen=0)
+    ),
+    ('regex_table', lexer.tokenize_to_table),
+    ('numpy_table', numpy_lexer.tokenize_to_table),
+])
+
+
+def source_list(size, *, seed=0):
+    '''Generate commands setting lists of 100 source files, up to size bytes.
+    '''
+    generator = corpus.Generator(seed)
+    lines = []
+    length = 0
+    while length < size:
+        lines.append('set(SOURCES_%d' % len(lines))
+        for _ in range(100):
+            lines.append(
+                '  src/%s/%s.cpp' % (generator.word(), generator.word())
+            )
+        lines.append(')')
+        length += sum(len(line) + 1 for line in lines[-102:])
+    return '\n'.join(lines).encode()
+
+
+def best_time(tokenize, buffer, repeat):
+    '''Get the best time of tokenizing buffer.
+    '''
+    return min(timeit.repeat(lambda: tokenize(buffer), number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='*', help='cmake files to tokenize')
+    parser.add_argument(
+        '--size',
+        type=float,
+        default=2,
+        help='size of the generated inputs, in MB (default: 2)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of timings to take'
+    )
+    args = parser.parse_args()
+    size = int(args.size * 1e6)
+    inputs = [
+        ('source_list', source_list(size)),
+        ('corpus', corpus.generate(size)[0].encode()),
+    ]
+    for filename in args.files:
+        with open(filename, 'rb') as f:
+            inputs.append((filename, f.read()))
+    print('%-16s %-14s %9s %9s' % ('input', 'engine', 'MB/s', 'speedup'))
+    for name, buffer in inputs:
+        baseline = None
+        for engine, tokenize in ENGINES.items():
+            seconds = best_time(tokenize, buffer, args.repeat)
+            baseline = baseline or seconds
+            print(
+                '%-16s %-14s %9.2f %8.1fx' %
+                (name, engine, len(buffer) / seconds / 1e6, baseline / seconds)
+            )
+
+
+if __name__ == '__main__':
+    main()
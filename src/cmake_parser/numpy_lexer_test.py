@@ -0,0 +1,81 @@
+# pylint: disable=missing-docstring
+
+import glob
+import itertools
+import mmap
+import pathlib
+import unittest
+
+import corpus
+import lexer
+
+try:
+    import numpy_lexer
+except ImportError:
+    numpy_lexer = None
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+@unittest.skipUnless(numpy_lexer, 'numpy is not installed')
+class TestTokenizeToTable(unittest.TestCase):
+
+    def _check(self, buffer):
+        try:
+            expected = list(lexer.tokenize_to_table(buffer).spans())
+        except ValueError as e:
+            with self.assertRaises(ValueError) as cm:
+                numpy_lexer.tokenize_to_table(buffer)
+            self.assertEqual(cm.exception.args, e.args)
+            return
+        table = numpy_lexer.tokenize_to_table(buffer)
+        self.assertEqual(list(table.spans()), expected, msg=buffer[:100])
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'rb') as f:
+                buffer = f.read()
+            self._check(buffer)
+            table = numpy_lexer.tokenize_to_table(buffer)
+            self.assertEqual(
+                list(table), list(lexer.Tokenizer.from_file(src_path))
+            )
+
+    def test_corpus(self):
+        for seed, mix in enumerate([None, {'unquoted_list': 20}]):
+            text, count = corpus.generate(100000, seed=seed, mix=mix)
+            self._check(text.encode())
+            table = numpy_lexer.tokenize_to_table(text.encode())
+            self.assertEqual(len(table), count)
+
+    def test_stateful_spots(self):
+        for text in [
+            '', ' ', 'a', 'a ', '(a)', '[[a]][[b]] c', 'a[[b c]]', '"a"[[b]]',
+            ')[=[x]=]', 'a\\;b c', 'a#b\nc', '"a"b c', '#[[x]] y', '[[a', '"a',
+            '"\\q"', '[x', 'a\\q', 'a b\\', 'x é(ü "ä")'
+        ]:
+            self._check(text.encode())
+
+    def test_all_short_inputs(self):
+        # Every input of up to 4 bytes of an alphabet hitting all the rules.
+        alphabet = [bytes([char]) for char in b' \n()#"\\[]=a;']
+        for size in range(5):
+            for chars in itertools.product(alphabet, repeat=size):
+                self._check(b''.join(chars))
+
+    def test_memory_map(self):
+        with open(str(DATA_DIR / '3.txt'), 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._check(buffer)
+
+    def test_errors(self):
+        table = numpy_lexer.tokenize_to_table(
+            b'# caf\xe9\nset(a)\n', errors='replace'
+        )
+        self.assertEqual(table[0].value, '# caf\ufffd')
+        self.assertEqual(table[3].value, 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
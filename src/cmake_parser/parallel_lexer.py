@@ -0,0 +1,216 @@
+'''Tokenize a single huge cmake source in parallel.
+
+The file is split into chunks at line starts that are likely to be between two
+command invocations, each chunk is tokenized by a worker process from its own
+memory map of the file, and the token spans of the chunks are joined.
+
+Nothing guarantees that a split point is not in the middle of a quoted or
+bracket argument, so the split points are validated while joining.  The regex
+engine of lexer keeps no state between tokens but the offset it resumes from,
+so the tokens of a chunk are those of a serial run if the tokens before it end
+by its start and the next one starts at or after it.  When that does not hold,
+the tokens are scanned serially from the end of the last good token until a
+token matches one found by a worker, from where on that worker's tokens are
+used again.  The result is always the one of a serial run, errors included.
+'''
+
+import array
+import bisect
+import concurrent.futures
+import os
+
+import lexer
+import source
+import token_table
+
+# Split points are only looked for that far after the ideal offsets.
+WINDOW = 64 * 1024
+
+# Files smaller than that are not split further.
+MIN_CHUNK_SIZE = 1 << 20
+
+
+def split_points(buffer, parts, *, window=WINDOW):
+    '''Find offsets splitting the buffer into parts of about the same size.
+
+    Each split point is the start of a line.  Lines following a line ending
+    with a closing parenthesis are preferred, as they most likely start a new
+    command invocation.
+
+    :return: The sorted list of split points, without 0 and the end of the
+        buffer.  It has less than parts - 1 items if the buffer has too few
+        lines.
+    '''
+    find = lexer._finder(buffer)  # pylint: disable=protected-access
+    size = len(buffer)
+    points = []
+    for i in range(1, parts):
+        target = max(i * size // parts, points[-1] if points else 0)
+        end = min(size, target + window)
+        point = find(b')\n', target, end)
+        if point != -1:
+            point += 2
+        else:
+            point = find(b'\n', target, end)
+            if point == -1:
+                continue
+            point += 1
+        if point < size and (not points or point > points[-1]):
+            points.append(point)
+    return points
+
+
+def _tokenize_chunk(filename, start, stop):
+    '''Tokenize the tokens of a file starting in [start, stop).
+
+    Scanning starts at offset start as if it were the end of a token.
+
+    This is an internal function and MUST NOT be used publicly.
+
+    :return: A (kinds, starts, ends, reached, failed) tuple, where reached
+        tells whether a token starting at or after stop was found, and failed
+        whether scanning raised an error, in which case the arrays only hold
+        the tokens before the error.
+    '''
+    # pylint: disable=protected-access
+    buffer = lexer.map_file(filename)
+    kinds = array.array('B')
+    starts = array.array('I')
+    ends = array.array('I')
+    try:
+        for clazz, token_start, token_end in lexer._scan(buffer, start):
+            if token_start >= stop:
+                return kinds, starts, ends, True, False
+            kinds.append(clazz.KIND)
+            starts.append(token_start)
+            ends.append(token_end)
+    except ValueError:
+        return kinds, starts, ends, False, True
+    return kinds, starts, ends, False, False
+
+
+class _Joiner(object):
+    '''Join the tokens of the chunks into a single TokenTable.
+
+    This is an internal class and MUST NOT be used publicly.
+    '''
+
+    def __init__(self, src, bounds, results):
+        '''Create a _Joiner.
+
+        :param src: The source.Source of the whole file.
+        :param bounds: The (start, stop) offsets of each chunk.
+        :param results: The result of _tokenize_chunk() for each chunk.
+        '''
+        self._buffer = src.buffer
+        self._bounds = bounds
+        self._results = results
+        self.table = token_table.TokenTable(src)
+        # The end of the last token of the table.
+        self._pos = 0
+
+    def _take(self, index, first):
+        '''Append the tokens of chunk index from its token first on.
+
+        :return: Whether the tokens of the next chunk may follow.
+        '''
+        kinds, starts, ends, reached, _ = self._results[index]
+        self.table.kinds.extend(kinds[first:])
+        self.table.starts.extend(starts[first:])
+        self.table.ends.extend(ends[first:])
+        if first < len(ends):
+            self._pos = ends[-1]
+        return reached
+
+    def _rescan(self, index):
+        '''Scan serially from the end of the last token until synced.
+
+        :param index: The chunk the scan starts in.
+
+        :return: The chunk the scan synced with, or None if it ran to the end.
+        '''
+        # pylint: disable=protected-access
+        table = self.table
+        for clazz, start, end in lexer._scan(self._buffer, self._pos):
+            while start >= self._bounds[index][1]:
+                index += 1
+            kinds, starts, ends, _, failed = self._results[index]
+            first = bisect.bisect_left(starts, start)
+            if not failed and first < len(starts) \
+                    and starts[first] == start and ends[first] == end \
+                    and kinds[first] == clazz.KIND:
+                # Same end, so the worker went on from there as a serial run.
+                if self._take(index, first):
+                    return index
+                return None
+            table.append(clazz.KIND, start, end)
+            self._pos = end
+        return None
+
+    def join(self):
+        '''Join the tokens of all chunks.
+
+        :return: The TokenTable of the whole buffer.
+        '''
+        index = 0
+        while index < len(self._results):
+            start, _ = self._bounds[index]
+            failed = self._results[index][4]
+            if not failed and self._pos <= start:
+                if not self._take(index, 0):
+                    break
+            else:
+                index = self._rescan(index)
+                if index is None:
+                    break
+            index += 1
+        return self.table
+
+
+def tokenize_file(
+    filename,
+    *,
+    jobs=None,
+    parts=None,
+    min_chunk_size=MIN_CHUNK_SIZE,
+    encoding='utf-8',
+    errors='strict'
+):
+    '''Tokenize a file into a token_table.TokenTable in a pool of processes.
+
+    The table is the same as the one of lexer.tokenize_to_table() over the
+    bytes of the file, and errors are reported the same way.  Its source is a
+    read-only memory map of the file.
+
+    :param jobs: The number of worker processes.  Defaults to the number of
+        CPUs.  With 1, the chunks are tokenized in this process, in order.
+    :param parts: The number of chunks.  Defaults to jobs.
+    :param min_chunk_size: The size under which a chunk is not split further.
+    :param encoding: Encoding used to decode the text of a token.
+    :param errors: The error handler used to decode that text.
+    '''
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if parts is None:
+        parts = jobs
+    buffer = lexer.map_file(filename)
+    size = len(buffer)
+    parts = max(1, min(parts, size // max(1, min_chunk_size)))
+    points = [0] + split_points(buffer, parts) + [size]
+    bounds = list(zip(points, points[1:])) or [(0, 0)]
+    filenames = [str(filename)] * len(bounds)
+    starts = [start for start, _ in bounds]
+    stops = [stop for _, stop in bounds]
+    if jobs == 1:
+        results = list(map(_tokenize_chunk, filenames, starts, stops))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs
+        ) as executor:
+            results = list(
+                executor.map(_tokenize_chunk, filenames, starts, stops)
+            )
+    src = source.Source(buffer, encoding=encoding, errors=errors)
+    return _Joiner(src, bounds, results).join()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''Measure how parallel_lexer scales with the number of processes.
+
+Writes a source generated by the corpus module to a temporary file, or uses the
+given file, and reports the best time of tokenizing it serially with
+lexer.tokenize_to_table() and with parallel_lexer.tokenize_file() for each
+number of jobs, with the speedup over the serial run.
+'''
+
+import argparse
+import os
+import tempfile
+import timeit
+
+import corpus
+import lexer
+import parallel_lexer
+
+
+def best_time(function, repeat):
+    '''Get the best time of calling function.
+    '''
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def run(path, jobs, repeat):
+    '''Print the timings of tokenizing the file at path.
+    '''
+    size = os.path.getsize(path)
+    serial = best_time(
+        lambda: lexer.tokenize_to_table(lexer.map_file(path)), repeat
+    )
+    print('%-10s %9s %9s' % ('jobs', 'MB/s', 'speedup'))
+    print('%-10s %9.2f %8.1fx' % ('serial', size / serial / 1e6, 1))
+    for count in jobs:
+        seconds = best_time(
+            # pylint: disable=cell-var-from-loop
+            lambda: parallel_lexer.tokenize_file(path, jobs=count),
+            repeat
+        )
+        print(
+            '%-10d %9.2f %8.1fx' %
+            (count, size / seconds / 1e6, serial / seconds)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('file', nargs='?', help='cmake file to tokenize')
+    parser.add_argument(
+        '--size',
+        type=float,
+        default=100,
+        help='size of the generated source, in MB (default: 100)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        action='append',
+        help='number of processes, may be repeated (default: 1, 2, 4, 8, 16)'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of timings to take'
+    )
+    args = parser.parse_args()
+    jobs = args.jobs or [1, 2, 4, 8, 16]
+    if args.file:
+        run(args.file, jobs, args.repeat)
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'CMakeLists.txt')
+        with open(path, 'w') as f:
+            f.write(corpus.generate(int(args.size * 1e6))[0])
+        run(path, jobs, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# pylint: disable=missing-docstring
+
+import glob
+import os
+import pathlib
+import tempfile
+import unittest
+
+import corpus
+import lexer
+import parallel_lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+class TestSplitPoints(unittest.TestCase):
+
+    def test_line_starts(self):
+        buffer = b'a(b)\nc(\nd)\ne(f)\n'
+        self.assertEqual(parallel_lexer.split_points(buffer, 2), [11])
+        self.assertEqual(parallel_lexer.split_points(buffer, 3), [11])
+        self.assertEqual(parallel_lexer.split_points(buffer, 16), [5, 11])
+        self.assertEqual(parallel_lexer.split_points(buffer, 1), [])
+
+    def test_no_command_end(self):
+        buffer = b'a\nb\nc\nd\n'
+        self.assertEqual(parallel_lexer.split_points(buffer, 2), [6])
+        self.assertEqual(parallel_lexer.split_points(b'a b c d', 4), [])
+
+
+class TestTokenizeFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'CMakeLists.txt')
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.rmdir(self.directory)
+
+    def _check(self, buffer, parts, jobs=1):
+        with open(self.path, 'wb') as f:
+            f.write(buffer)
+        try:
+            expected = list(lexer.tokenize_to_table(buffer).spans())
+        except ValueError as e:
+            with self.assertRaises(ValueError) as cm:
+                parallel_lexer.tokenize_file(
+                    self.path, jobs=jobs, parts=parts, min_chunk_size=1
+                )
+            self.assertEqual(cm.exception.args, e.args)
+            return
+        table = parallel_lexer.tokenize_file(
+            self.path, jobs=jobs, parts=parts, min_chunk_size=1
+        )
+        self.assertEqual(list(table.spans()), expected, msg=(buffer, parts))
+
+    def test_realfiles(self):
+        for src_path in glob.glob(str(DATA_DIR / '*.txt')):
+            with open(src_path, 'rb') as f:
+                buffer = f.read()
+            for parts in (1, 2, 7, 64):
+                self._check(buffer, parts)
+
+    def test_corpus(self):
+        text, count = corpus.generate(200000, seed=3)
+        self._check(text.encode(), 32)
+        table = parallel_lexer.tokenize_file(
+            self.path, jobs=1, parts=32, min_chunk_size=1
+        )
+        self.assertEqual(len(table), count)
+
+    def test_unsafe_split_points(self):
+        for buffer in [
+            b'a("x)\ny(z)\n" b)\nc(d)\n',
+            b'a([[x)\ny(z)\n]] b)\nc(d)\n',
+            b'#[[ x)\ny(z)\n]]\nc(d)\n',
+            b'a("x)\ny(z)\n',
+            b'a([=[x)\ny(z)\n',
+            b'a("x)\n\\q(z)\n" b)\nc(d)\n',
+            b'a(x)\nb(\\q)\nc(d)\n',
+            b'a("\\q)\ny(z)\n" b)\nc(d)\n',
+            b'',
+            b'\n\n\n\n',
+        ]:
+            for parts in range(1, 8):
+                self._check(buffer, parts)
+
+    def test_pool(self):
+        text, _ = corpus.generate(50000, seed=4)
+        self._check(text.encode(), 4, jobs=2)
+
+    def test_min_chunk_size(self):
+        with open(str(DATA_DIR / '3.txt'), 'rb') as f:
+            buffer = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(buffer)
+        table = parallel_lexer.tokenize_file(self.path, jobs=1, parts=8)
+        self.assertEqual(
+            list(table.spans()), list(lexer.tokenize_to_table(buffer).spans())
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
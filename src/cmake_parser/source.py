@@ -0,0 +1,261 @@
+'''Cmake source held in a single buffer and shared by the tokens lexed from it.
+'''
+
+import array
+import bisect
+import re
+
+_STR_NEWLINE_REGEX = re.compile('\n')
+_BYTES_NEWLINE_REGEX = re.compile(b'\n')
+
+
+class LineIndex(object):
+    '''The offsets at which the lines of a source start.
+
+    Maps an offset to a (line, column) position with a binary search.  Lines
+    and columns are 1-based.  Columns count characters for str sources and
+    bytes for bytes-like sources.
+    '''
+
+    def __init__(self):
+        self.line_starts = array.array('Q', [0])
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        '''Create the LineIndex of a whole buffer.
+        '''
+        index = cls()
+        index.extend(buffer, 0)
+        return index
+
+    def extend(self, block, base):
+        '''Add the lines starting in a block of the source.
+
+        Blocks must be added in order and without gaps.
+
+        :param block: A str or bytes-like block of the source.
+        :param base: The offset of the block in the source.
+        '''
+        regex = _STR_NEWLINE_REGEX if isinstance(block, str) \
+                else _BYTES_NEWLINE_REGEX
+        self.line_starts.extend(
+            match.end() + base for match in regex.finditer(block)
+        )
+
+    def position(self, offset):
+        '''Get the (line, column) position of an offset.
+        '''
+        line = bisect.bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+
+class _Pieces(object):
+    '''The pieces an edited buffer is made of.
+
+    A piece is a run of the buffer that was either there before the first edit
+    or inserted by a later one.  It is stored as an [offset, base] list: its
+    offset in the current buffer, and the offset that the tokens created before
+    it moved store for its start.  The stored offsets of all pieces are
+    disjoint ranges, so a stored offset belongs to the piece with the greatest
+    base not after it, and is moved by as much as that piece.
+
+    This is an internal class and MUST NOT be used publicly.
+    '''
+
+    def __init__(self, size):
+        '''Create the single piece of a buffer of the given size.
+        '''
+        pieces = [[0, 0]] if size else []
+        # The pieces and their offsets in buffer order.
+        self.pieces = pieces
+        self.offsets = [0] * len(pieces)
+        # The pieces and their bases in base order.
+        self.by_base = list(pieces)
+        self.bases = [0] * len(pieces)
+        # The base of the next inserted piece, past all the stored offsets.
+        self.next_base = size
+        self.size = size
+
+    def __len__(self):
+        return len(self.pieces)
+
+    def locate(self, start):
+        '''Get the current offset of the stored offset start.
+        '''
+        offset, base = self.by_base[bisect.bisect_right(self.bases, start) - 1]
+        return start + offset - base
+
+    def anchor(self, offset):
+        '''Get the offset to store for the current offset.
+        '''
+        piece_offset, base = self.pieces[
+            bisect.bisect_right(self.offsets, offset) - 1]
+        return offset - piece_offset + base
+
+    def _split(self, offset):
+        '''Make offset the start of a piece.
+
+        :return: The index of that piece in buffer order, or the number of
+            pieces if offset is the end of the buffer.
+        '''
+        if offset == self.size:
+            return len(self.pieces)
+        index = bisect.bisect_right(self.offsets, offset) - 1
+        piece_offset, base = self.pieces[index]
+        if piece_offset == offset:
+            return index
+        piece = [offset, base + offset - piece_offset]
+        index += 1
+        self.pieces.insert(index, piece)
+        self.offsets.insert(index, offset)
+        at = bisect.bisect_right(self.bases, piece[1])
+        self.by_base.insert(at, piece)
+        self.bases.insert(at, piece[1])
+        return index
+
+    def replace(self, start, end, length):
+        '''Replace the run [start, end) of the buffer with length new items.
+
+        Costs time proportional to the number of pieces, but not to the size of
+        the buffer nor to the number of tokens.
+        '''
+        first = self._split(start)
+        stop = self._split(end)
+        for _, base in self.pieces[first:stop]:
+            at = bisect.bisect_left(self.bases, base)
+            del self.by_base[at]
+            del self.bases[at]
+        del self.pieces[first:stop]
+        del self.offsets[first:stop]
+        delta = length - (end - start)
+        if delta:
+            pieces = self.pieces
+            offsets = self.offsets
+            for index in range(first, len(pieces)):
+                pieces[index][0] += delta
+                offsets[index] += delta
+        self.size += delta
+        if not length:
+            return
+        # Text typed at the end of the last inserted text extends its piece.
+        if first:
+            offset, base = self.pieces[first - 1]
+            if base + start - offset == self.next_base:
+                self.next_base += length
+                return
+        piece = [start, self.next_base]
+        self.pieces.insert(first, piece)
+        self.offsets.insert(first, start)
+        self.by_base.append(piece)
+        self.bases.append(piece[1])
+        self.next_base += length
+
+
+class Source(object):
+    '''A whole cmake source held in one buffer.
+
+    Tokens created by tok.Token.from_span() refer to a Source by offsets and
+    get their text from it on demand.
+
+    The buffer can be a str, or a bytes-like object such as bytes, bytearray,
+    memoryview or mmap.mmap.  For bytes-like buffers, offsets are byte offsets
+    and text is decoded with the given encoding only when requested, so bytes
+    that cannot be decoded only matter if the text of a span holding them is
+    asked for.  errors is the error handler of bytes.decode(), e.g., 'replace'
+    to decode such bytes as U+FFFD.
+
+    Editing the buffer with replace() does not touch the tokens referring to
+    the source.  Tokens keep the offsets they were created with, and the
+    source maps them to the current ones with locate().  Tokens created after
+    an edit store the offsets given by anchor().
+    '''
+
+    def __init__(self, buffer, *, encoding='utf-8', errors='strict'):
+        self.buffer = buffer
+        self.encoding = encoding
+        self.errors = errors
+        self._line_index = None
+        # The _Pieces of the buffer since its first edit.
+        self._pieces = None
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def text(self, start, end):
+        '''Get the text of buffer[start:end] as a str.
+        '''
+        text = self.buffer[start:end]
+        if isinstance(text, str):
+            return text
+        return bytes(text).decode(self.encoding, self.errors)
+
+    @property
+    def line_index(self):
+        '''The LineIndex of the buffer, built on first use.
+        '''
+        if self._line_index is None:
+            self._line_index = LineIndex.from_buffer(self.buffer)
+        return self._line_index
+
+    def position(self, offset):
+        '''Get the 1-based (line, column) position of an offset.
+        '''
+        return self.line_index.position(offset)
+
+    @property
+    def piece_count(self):
+        '''The number of pieces the buffer is made of since its first edit.
+        '''
+        return 1 if self._pieces is None else len(self._pieces)
+
+    def locate(self, start):
+        '''Get the current offset of a token stored with offset start.
+        '''
+        pieces = self._pieces
+        if pieces is None:
+            return start
+        return pieces.locate(start)
+
+    def anchor(self, offset):
+        '''Get the offset to store in a token starting at the current offset.
+        '''
+        pieces = self._pieces
+        if pieces is None:
+            return offset
+        return pieces.anchor(offset)
+
+    def flatten(self):
+        '''Forget the edits made to the buffer.
+
+        The stored offsets become the current ones, so the tokens referring to
+        the source must all be moved to their current offsets first with
+        tok.settle().
+        '''
+        self._pieces = None
+
+    def replace(self, start, end, text):
+        '''Replace buffer[start:end] with text.
+
+        A str buffer becomes a new str holding the edited source, and any other
+        buffer a bytearray edited in place.  The line index is rebuilt on next
+        use.  The tokens referring to the source are not touched: the ones
+        after the edit are moved by locate().
+
+        :param text: A str for str buffers, bytes for bytes-like ones.
+        '''
+        if not 0 <= start <= end <= len(self.buffer):
+            raise ValueError(
+                'invalid edit', (start, end), 'of a source of length',
+                len(self.buffer)
+            )
+        if self._pieces is None:
+            self._pieces = _Pieces(len(self.buffer))
+        self._pieces.replace(start, end, len(text))
+        buffer = self.buffer
+        if isinstance(buffer, str):
+            self.buffer = buffer[:start] + text + buffer[end:]
+        else:
+            if not isinstance(buffer, bytearray):
+                buffer = self.buffer = bytearray(buffer)
+            buffer[start:end] = text
+        self._line_index = None
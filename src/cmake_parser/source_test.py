@@ -0,0 +1,87 @@
+# pylint: disable=missing-docstring
+
+import unittest
+
+import source
+
+
+class TestSource(unittest.TestCase):
+
+    def test_text(self):
+        text = 'set(a é)'
+        for buffer in [text, text.encode(), memoryview(text.encode())]:
+            src = source.Source(buffer)
+            self.assertEqual(src.text(0, 3), 'set')
+            self.assertEqual(src.text(4, 5), 'a')
+            self.assertEqual(src.text(0, len(src)), text)
+
+    def test_encoding(self):
+        src = source.Source('é'.encode('latin-1'), encoding='latin-1')
+        self.assertEqual(src.text(0, 1), 'é')
+
+    def test_errors(self):
+        buffer = b'# \xff\nset'
+        src = source.Source(buffer)
+        self.assertEqual(src.text(4, 7), 'set')
+        with self.assertRaises(UnicodeDecodeError):
+            src.text(0, 3)
+        src = source.Source(buffer, errors='replace')
+        self.assertEqual(src.text(0, 3), '# \ufffd')
+
+    def test_position(self):
+        text = 'a\nbc\n\nd'
+        for buffer in [text, text.encode()]:
+            src = source.Source(buffer)
+            self.assertEqual(src.position(0), (1, 1))
+            self.assertEqual(src.position(1), (1, 2))
+            self.assertEqual(src.position(2), (2, 1))
+            self.assertEqual(src.position(4), (2, 3))
+            self.assertEqual(src.position(5), (3, 1))
+            self.assertEqual(src.position(6), (4, 1))
+            self.assertEqual(src.position(7), (4, 2))
+
+    def test_replace(self):
+        for encode in (str, str.encode):
+            src = source.Source(encode('abc def ghi'))
+            self.assertEqual(src.piece_count, 1)
+            src.replace(4, 4, encode('xy'))
+            src.replace(5, 8, encode(''))
+            self.assertEqual(src.text(0, len(src)), 'abc xf ghi')
+            # Offsets stored before the edits move with the text.
+            self.assertEqual(src.locate(0), 0)
+            self.assertEqual(src.locate(6), 5)
+            self.assertEqual(src.locate(8), 7)
+            # Offsets stored after them go back to the current ones.
+            for offset in range(len(src)):
+                self.assertEqual(src.locate(src.anchor(offset)), offset)
+            self.assertEqual(src.piece_count, 3)
+            src.flatten()
+            self.assertEqual(src.piece_count, 1)
+            self.assertEqual(src.locate(8), 8)
+            with self.assertRaises(ValueError):
+                src.replace(5, 20, encode(''))
+
+    def test_replace_empty(self):
+        src = source.Source('')
+        src.replace(0, 0, 'ab')
+        src.replace(2, 2, 'c')
+        self.assertEqual(src.buffer, 'abc')
+        self.assertEqual(src.piece_count, 1)
+        self.assertEqual(src.locate(src.anchor(2)), 2)
+
+
+class TestLineIndex(unittest.TestCase):
+
+    def test_extend(self):
+        text = 'a\nbc\n\nd\n'
+        expected = source.LineIndex.from_buffer(text)
+        for block_size in range(1, len(text) + 1):
+            index = source.LineIndex()
+            for base in range(0, len(text), block_size):
+                index.extend(text[base:base + block_size], base)
+            self.assertEqual(index.line_starts, expected.line_starts)
+        self.assertEqual(list(expected.line_starts), [0, 2, 5, 6, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+'''Measure the memory held by a list of tokens.
+
+Reports the bytes retained per token when all tokens of a file are kept in a
+list, for tokens owning their text with and without their location, and for
+tokens referring to a shared source by offsets, and when only their kinds and
+offsets are kept in a token_table.TokenTable.  The source text itself is not
+counted.
+'''
+
+import argparse
+import gc
+import pathlib
+import tracemalloc
+
+import lexer
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+MODES = {
+    'text':
+    lambda text: list(lexer.Tokenizer.from_string(text, locations=False)),
+    'located': lambda text: list(lexer.Tokenizer.from_string(text)),
+    'span': lambda text: list(lexer.Tokenizer.from_buffer(text)),
+    'table': lexer.tokenize_to_table,
+}
+
+
+def measure(text, mode):
+    '''Measure the memory retained by the tokens of text.
+
+    :return: A (number of tokens, bytes per token) tuple.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tokens = MODES[mode](text)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return len(tokens), (after - before) / len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        'files',
+        nargs='*',
+        default=[str(DATA_DIR / '3.txt')],
+        help='cmake files to tokenize (default: test_data/3.txt)'
+    )
+    args = parser.parse_args()
+    for filename in args.files:
+        with open(filename, 'r') as f:
+            text = f.read()
+        for mode in sorted(MODES):
+            count, per_token = measure(text, mode)
+            print(
+                '%s\t%s\t%d tokens\t%.1f bytes/token' %
+                (filename, mode, count, per_token)
+            )
+
+
+if __name__ == '__main__':
+    main()
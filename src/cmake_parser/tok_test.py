@@ -1,7 +1,9 @@
 # pylint: disable=missing-docstring
 
+import pickle
 import unittest
 
+import source
 import tok
 
 
@@ -38,6 +40,26 @@ class TestArgumentClasses(unittest.TestCase):
             self.assertEqual(orig_text, arg.orig_text)
             self.assertEqual(value, arg.value, msg=orig_text)
 
+    def test_quoted_argument_escapes(self):
+        data = {
+            r'"\\n"': '\\n',
+            r'"a\"b"': 'a"b',
+            r'"\$\{var\}"': '${var}',
+            r'"\;"': ';',
+            '"\\\n"': '',
+            '"foo\nbar"': 'foo\nbar',
+        }
+        for orig_text, value in data.items():
+            arg = tok.QuotedArgument(orig_text)
+            self.assertEqual(value, arg.value, msg=orig_text)
+
+    def test_value_is_memoized(self):
+        for arg in [
+            tok.QuotedArgument(r'"a\tb"'),
+            tok.UnquotedArgument(r'a\;b'),
+        ]:
+            self.assertIs(arg.value, arg.value)
+
     def test_unquoted_argument(self):
         data = {
             'NoSpace': 'NoSpace',
@@ -50,5 +72,100 @@ class TestArgumentClasses(unittest.TestCase):
             self.assertEqual(value, arg.value, msg=orig_text)
 
 
+class TestCompactTokens(unittest.TestCase):
+
+    def test_slots(self):
+        tokens = [
+            tok.Comment('# foo'),
+            tok.BracketArgument('[[foo]]'),
+            tok.QuotedArgument('"foo"'),
+            tok.UnquotedArgument('foo'),
+            tok.Bra('('),
+            tok.Ket(')'),
+        ]
+        for token in tokens:
+            self.assertFalse(hasattr(token, '__dict__'), msg=token)
+
+    def test_shared_delimiters(self):
+        self.assertIs(tok.Bra('('), tok.Bra('('))
+        self.assertIs(tok.Ket(')'), tok.Ket(')'))
+        self.assertIsNot(tok.Bra('('), tok.Ket(')'))
+        self.assertEqual(tok.Bra('(').orig_text, '(')
+        self.assertEqual(tok.Ket(')').value, ')')
+
+        src = source.Source('()')
+        bra = tok.Bra.from_span(src, 0, 1)
+        self.assertIsNot(bra, tok.Bra('('))
+        self.assertEqual(bra, tok.Bra('('))
+        self.assertEqual(bra.span, (0, 1))
+        self.assertIsNone(tok.Bra('(').span)
+
+        bra = tok.Bra('(', None, 5, 6)
+        self.assertIsNot(bra, tok.Bra('('))
+        self.assertEqual(bra.offset, 5)
+        self.assertIsNone(tok.Bra('(').offset)
+
+    def test_pickle(self):
+        src = source.Source('(foo)')
+        tokens = [
+            tok.Bra('('),
+            tok.Bra.from_span(src, 0, 1),
+            tok.UnquotedArgument.from_span(src, 1, 4),
+            tok.Ket(')'),
+        ]
+        for token in tokens:
+            actual = pickle.loads(pickle.dumps(token))
+            self.assertEqual(actual, token)
+            self.assertEqual(actual.span, token.span)
+        self.assertIsNone(tok.Bra('(').span)
+
+
+class TestSpan(unittest.TestCase):
+
+    def test_from_span(self):
+        src = source.Source('foo("bar" [[baz]])')
+        data = [
+            (tok.UnquotedArgument, 0, 3, 'foo'),
+            (tok.Bra, 3, 4, '('),
+            (tok.QuotedArgument, 4, 9, 'bar'),
+            (tok.BracketArgument, 10, 17, 'baz'),
+            (tok.Ket, 17, 18, ')'),
+        ]
+        for clazz, start, end, value in data:
+            arg = clazz.from_span(src, start, end)
+            self.assertEqual(arg.span, (start, end))
+            self.assertEqual(arg.value, value)
+            self.assertEqual(arg, clazz(src.text(start, end)))
+
+    def test_no_span(self):
+        for token in [tok.UnquotedArgument('foo'), tok.Bra('(')]:
+            self.assertIsNone(token.span)
+            self.assertIsNone(token.offset)
+            self.assertIsNone(token.line)
+            self.assertIsNone(token.column)
+
+    def test_location(self):
+        src = source.Source('foo(\n  bar)')
+        data = [
+            (tok.UnquotedArgument, 0, 3, 1, 1),
+            (tok.Bra, 3, 4, 1, 4),
+            (tok.UnquotedArgument, 7, 10, 2, 3),
+            (tok.Ket, 10, 11, 2, 6),
+        ]
+        for clazz, start, end, line, column in data:
+            for token in [
+                clazz.from_span(src, start, end),
+                clazz(src.text(start, end), src, start, end),
+            ]:
+                self.assertEqual(token.offset, start)
+                self.assertEqual(token.line, line)
+                self.assertEqual(token.column, column)
+
+    def test_kinds(self):
+        for kind, clazz in tok.CLASSES.items():
+            self.assertIs(clazz.KIND, kind)
+        self.assertEqual(set(tok.CLASSES), set(tok.Kind))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,113 @@
+'''Tokens of a whole source stored column by column.
+'''
+
+import array
+import itertools
+import operator
+
+import tok
+
+
+class TokenTable(object):
+    '''Struct-of-arrays storage for the tokens of a source.
+
+    Holds one array of token kinds and two arrays of start and end offsets,
+    plus the shared source.Source the offsets refer to.  Token objects are only
+    created when a caller indexes or iterates over the table, so questions such
+    as "how many commands" or "where are all the parentheses" are answered
+    without creating any.
+    '''
+
+    def __init__(self, source, kinds=None, starts=None, ends=None):
+        '''Create a TokenTable.
+
+        :param source: The source.Source the offsets refer to.
+        :param kinds: An array('B') of tok.Kind values.  Empty if None.
+        :param starts: An array('I') of start offsets.  Empty if None.
+        :param ends: An array('I') of end offsets.  Empty if None.
+        '''
+        self.source = source
+        self.kinds = array.array('B') if kinds is None else kinds
+        self.starts = array.array('I') if starts is None else starts
+        self.ends = array.array('I') if ends is None else ends
+        if not len(self.kinds) == len(self.starts) == len(self.ends):
+            raise ValueError('kinds, starts and ends differ in length.')
+
+    def append(self, kind, start, end):
+        '''Append the span of a token.
+        '''
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        '''Get a token, or a TokenTable if index is a slice.
+        '''
+        if isinstance(index, slice):
+            return self.__class__(
+                self.source, self.kinds[index], self.starts[index],
+                self.ends[index]
+            )
+        return tok.CLASSES[self.kinds[index]].from_span(
+            self.source, self.starts[index], self.ends[index]
+        )
+
+    def __iter__(self):
+        classes = tok.CLASSES
+        src = self.source
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            yield classes[kind](None, src, start, end)
+
+    def iter_batches(self, size):
+        '''Generate TokenTables of up to size consecutive tokens.
+
+        The tables share the source of this one, so making them copies no more
+        than their arrays.  A pickled table holds its whole source, though, so
+        send lists of tokens from Tokenizer.iter_batches() to other processes
+        instead, unless they already have the source.
+        '''
+        if size < 1:
+            raise ValueError(size, 'is not a positive batch size')
+        for start in range(0, len(self), size):
+            yield self[start:start + size]
+
+    def spans(self):
+        '''Iterate over the (kind, start, end) tuples of all tokens.
+        '''
+        return zip(self.kinds, self.starts, self.ends)
+
+    def count(self, kind):
+        '''Count the tokens of a tok.Kind.
+        '''
+        return self.kinds.count(kind)
+
+    def _mask(self, kind):
+        '''Iterate over booleans telling which tokens are of a tok.Kind.
+        '''
+        return map(operator.eq, self.kinds, itertools.repeat(kind))
+
+    def offsets(self, kind):
+        '''Get the start offsets of all tokens of a tok.Kind.
+
+        :return: An array('I').
+        '''
+        return array.array(
+            'I', itertools.compress(self.starts, self._mask(kind))
+        )
+
+    def select(self, *kinds):
+        '''Get a TokenTable holding only the tokens of the given tok.Kinds.
+        '''
+        if len(kinds) == 1:
+            mask = list(self._mask(kinds[0]))
+        else:
+            mask = [kind in kinds for kind in self.kinds]
+        return self.__class__(
+            self.source,
+            array.array('B', itertools.compress(self.kinds, mask)),
+            array.array('I', itertools.compress(self.starts, mask)),
+            array.array('I', itertools.compress(self.ends, mask)),
+        )
@@ -0,0 +1,85 @@
+# pylint: disable=missing-docstring
+
+import array
+import unittest
+
+import source
+import tok
+import token_table
+
+
+class TestTokenTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = token_table.TokenTable(source.Source('a(b "c")'))
+        spans = [
+            (tok.Kind.UnquotedArgument, 0, 1),
+            (tok.Kind.Bra, 1, 2),
+            (tok.Kind.UnquotedArgument, 2, 3),
+            (tok.Kind.QuotedArgument, 4, 7),
+            (tok.Kind.Ket, 7, 8),
+        ]
+        for span in spans:
+            self.table.append(*span)
+
+    def test_tokens(self):
+        expected = [
+            tok.UnquotedArgument('a'),
+            tok.Bra('('),
+            tok.UnquotedArgument('b'),
+            tok.QuotedArgument('"c"'),
+            tok.Ket(')'),
+        ]
+        self.assertEqual(len(self.table), len(expected))
+        self.assertEqual(list(self.table), expected)
+        for i, token in enumerate(expected):
+            self.assertEqual(self.table[i], token)
+        self.assertEqual(self.table[-1].span, (7, 8))
+
+    def test_slice(self):
+        table = self.table[1:3]
+        self.assertIsInstance(table, token_table.TokenTable)
+        self.assertIs(table.source, self.table.source)
+        self.assertEqual(list(table), [tok.Bra('('), tok.UnquotedArgument('b')])
+        self.assertEqual(list(table.spans()), [(5, 1, 2), (4, 2, 3)])
+
+    def test_iter_batches(self):
+        batches = list(self.table.iter_batches(2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        for batch in batches:
+            self.assertIs(batch.source, self.table.source)
+        self.assertEqual([token for batch in batches for token in batch],
+                         list(self.table))
+        self.assertEqual(len(list(self.table.iter_batches(5))), 1)
+        with self.assertRaises(ValueError):
+            list(self.table.iter_batches(0))
+
+    def test_count(self):
+        self.assertEqual(self.table.count(tok.Kind.UnquotedArgument), 2)
+        self.assertEqual(self.table.count(tok.Kind.Comment), 0)
+
+    def test_offsets(self):
+        self.assertEqual(
+            self.table.offsets(tok.Kind.Bra), array.array('I', [1])
+        )
+        self.assertEqual(
+            self.table.offsets(tok.Kind.UnquotedArgument),
+            array.array('I', [0, 2])
+        )
+
+    def test_select(self):
+        table = self.table.select(tok.Kind.Bra, tok.Kind.Ket)
+        self.assertEqual(list(table), [tok.Bra('('), tok.Ket(')')])
+        table = self.table.select(tok.Kind.QuotedArgument)
+        self.assertEqual(list(table), [tok.QuotedArgument('"c"')])
+
+    def test_mismatched_columns(self):
+        with self.assertRaises(ValueError):
+            token_table.TokenTable(
+                source.Source(''), array.array('B', [1]), array.array('I'),
+                array.array('I')
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
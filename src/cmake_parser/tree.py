@@ -0,0 +1,124 @@
+'''Parse all the cmake sources of a whole tree in parallel.
+'''
+
+import concurrent.futures
+import os
+import pathlib
+
+import ast
+import lexer
+
+FILENAME = 'CMakeLists.txt'
+SUFFIX = '.cmake'
+
+CHUNK_SIZE = 16
+
+
+def find_files(root):
+    '''Generate the paths of all cmake sources under root, in walk order.
+
+    cmake sources are the CMakeLists.txt and *.cmake files.
+
+    :return: A generator of pathlib.Path.
+    '''
+    for dirpath, dirnames, filenames in os.walk(str(root)):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename == FILENAME or filename.endswith(SUFFIX):
+                yield pathlib.Path(dirpath) / filename
+
+
+def parse_file(path, *, cache=None):
+    '''Tokenize a file into a token_table.TokenTable and check that it parses.
+
+    The file is read as bytes, so the offsets in the table are byte offsets and
+    the text of a token is only decoded when asked for.  The spans of the table
+    are then walked with ast.walk_spans(), so that a file AstParser would
+    reject, e.g., with a command that is not closed, raises a ValueError too.
+
+    :param cache: If not None, a cache.DiskCache or cache.MemoryCache to get
+        the table from, or to store it in if missing.
+
+    :return: A (path, table) tuple.
+    '''
+    try:
+        if cache is not None:
+            table = cache.tokenize_file(path)
+        else:
+            with open(str(path), 'rb') as f:
+                table = lexer.tokenize_to_table(f.read())
+        for _ in ast.walk_spans(table.source, spans=table.spans()):
+            pass
+        return path, table
+    except ValueError as e:
+        raise ValueError(str(path), *e.args) from None
+
+
+def _parse_chunk(paths, cache):
+    '''Parse a list of files.
+
+    This is an internal function and MUST NOT be used publicly.
+    '''
+    return [parse_file(path, cache=cache) for path in paths]
+
+
+def _chunks(paths, chunk_size):
+    '''Group paths into lists of chunk_size paths.
+    '''
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_files(paths, *, jobs=None, chunk_size=CHUNK_SIZE, cache=None):
+    '''Parse files in a pool of processes.
+
+    Files are sent to the workers in chunks of chunk_size files, and results
+    are generated as soon as their chunk completes, so they come in no
+    particular order.  Each result is a (path, token_table.TokenTable) tuple,
+    which is what crosses the process boundary: a few compact arrays and the
+    bytes of the file.
+
+    A file that cannot be tokenized or parsed raises a ValueError whose first
+    argument is its path.
+
+    :param paths: An iterable of paths.
+    :param jobs: The number of worker processes.  Defaults to the number of
+        CPUs.  With 1, files are parsed in this process, in order.
+    :param chunk_size: The number of files parsed by a worker per task.
+    :param cache: If not None, a cache.DiskCache shared by all workers, or,
+        with jobs=1 only, a cache.MemoryCache.
+    '''
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        for path in paths:
+            yield parse_file(path, cache=cache)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_parse_chunk, chunk, cache)
+            for chunk in _chunks(paths, chunk_size)
+        ]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parse_tree(root, *, jobs=None, chunk_size=CHUNK_SIZE, cache=None):
+    '''Parse all the cmake sources under root in a pool of processes.
+
+    See find_files() for what the cmake sources are and parse_files() for the
+    parameters and results.
+    '''
+    return parse_files(
+        find_files(root), jobs=jobs, chunk_size=chunk_size, cache=cache
+    )
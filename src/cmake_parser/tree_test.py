@@ -0,0 +1,72 @@
+# pylint: disable=missing-docstring
+
+import pathlib
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import ast
+import lexer
+import tree
+
+THIS_DIR = pathlib.Path(__file__).resolve().parent
+DATA_DIR = THIS_DIR / 'test_data'
+
+
+class TestTree(unittest.TestCase):
+
+    def setUp(self):
+        self.root = pathlib.Path(tempfile.mkdtemp())
+        self.expected = {}
+        for i, src_path in enumerate(sorted(DATA_DIR.glob('*.txt'))):
+            if i % 2:
+                path = self.root / ('dir%d' % i) / 'CMakeLists.txt'
+            else:
+                path = self.root / ('module%d.cmake' % i)
+            path.parent.mkdir(exist_ok=True)
+            shutil.copy(str(src_path), str(path))
+            with open(str(path), 'rb') as f:
+                self.expected[path] = list(
+                    lexer.Tokenizer.from_buffer(f.read())
+                )
+        (self.root / 'README.txt').write_text('not(cmake')
+
+    def tearDown(self):
+        shutil.rmtree(str(self.root))
+
+    def test_find_files(self):
+        self.assertEqual(
+            sorted(tree.find_files(self.root)), sorted(self.expected)
+        )
+
+    def test_parse_tree(self):
+        for jobs in (1, 2):
+            results = dict(tree.parse_tree(self.root, jobs=jobs, chunk_size=1))
+            self.assertEqual(sorted(results), sorted(self.expected))
+            for path, table in results.items():
+                self.assertEqual(list(table), self.expected[path], msg=path)
+
+    def test_pickle(self):
+        path = next(tree.find_files(self.root))
+        _, table = tree.parse_file(path)
+        copy = pickle.loads(pickle.dumps(table))
+        self.assertEqual(list(copy), self.expected[path])
+
+    def test_error(self):
+        bad = self.root / 'bad.cmake'
+        for text in ('foo(\\q)', 'foo(a (b)', 'foo)', '1foo()'):
+            bad.write_text(text)
+            with self.assertRaises(ValueError) as expected:
+                ast.AstParser.from_string(text).parse()
+            for jobs in (1, 2):
+                with self.assertRaises(ValueError, msg=text) as cm:
+                    list(tree.parse_tree(self.root, jobs=jobs))
+                self.assertEqual(cm.exception.args[0], str(bad))
+                self.assertEqual(
+                    cm.exception.args[1:], expected.exception.args, msg=text
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()